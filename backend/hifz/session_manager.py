@@ -1,7 +1,7 @@
-from utils.audio_utils import record_audio
 from ml.transcriber import transcribe_audio
-from scripts.ayah_matcher import find_most_similar_ayah
+from scripts.ayah_matcher import find_most_similar_ayah, get_ayah
 from hifz.tracker import HifzTracker
+from hifz.quran import clean_translation
 
 class SessionManager:
     def __init__(self):
@@ -17,57 +17,103 @@ class SessionManager:
         self.session_active = False
         print("🔁 Session reset.\n")
 
+    def expected_text(self):
+        """Translation of the next expected ayah, or None before the session starts."""
+        if not self.session_active:
+            return None
+        expected = get_ayah(self.surah, self.tracker.expected)
+        return clean_translation(expected["english_text"]) if expected else None
+
+    def process_transcript(self, transcript, top_k=3, verbose=True):
+        """
+        Match one chunk's transcript and advance the session.
+
+        Args:
+            transcript (str): Transcribed text of the chunk.
+            top_k (int): Number of candidate ayahs to return.
+            verbose (bool): Print progress as the live session does.
+
+        Returns:
+            dict: matches (top-k candidates), status (a tracker status or one of
+            "no_match", "below_threshold", "session_start", "wrong_surah",
+            "continuing") and ayahs, the (ayah, status) pairs credited.
+        """
+        log = print if verbose else (lambda *args, **kwargs: None)
+
+        # Match ayahs (filtered after session starts)
+        matches = find_most_similar_ayah(
+            transcript,
+            top_k=top_k,
+            surah_filter=self.surah if self.session_active else None
+        )
+        result = {"matches": matches, "status": "no_match", "ayahs": []}
+
+        if not matches:
+            log("No match found.")
+            return result
+
+        best = matches[0]
+        surah = best["surah"]
+        ayah = best["ayah"]
+        similarity = best["similarity"]
+
+        # Set appropriate similarity threshold
+        min_similarity = 0.59 if not self.session_active else 0.35
+        if similarity < min_similarity:
+            log(f"Match below similarity threshold ({similarity:.2f} < {min_similarity}). Try again.")
+            result["status"] = "below_threshold"
+            return result
+
+        # First ayah → start session
+        if not self.session_active:
+            self.surah = surah
+            self.tracker = HifzTracker(surah_num=surah, total_ayahs=999)  # TODO: pull actual count
+            self.tracker.expected = ayah + 1
+            self.ayah_history.append(ayah)
+            self.session_active = True
+            log(f"🎯 Starting session at Surah {surah}, Ayah {ayah}")
+            result["status"] = "session_start"
+            result["ayahs"] = [(ayah, "session_start")]
+            return result
+
+        # Mid-session validation
+        if surah != self.surah:
+            log(f" *WRONG SURAH* Expected Surah {self.surah}, got {surah}.")
+            result["status"] = "wrong_surah"
+            return result
+
+        # Later window of the ayah we just heard: same ayah, still going
+        if best.get("match_kind") == "window" and best["word_offset"] > 0 \
+                and self.ayah_history and self.ayah_history[-1] == ayah:
+            log(f" Surah {surah}, Ayah {ayah} — CONTINUING (score: {similarity:.2f})")
+            result["status"] = "continuing"
+            return result
+
+        # A chunk spanning a boundary finishes one ayah and starts the next
+        covered = list(range(ayah, best.get("end_ayah", ayah) + 1))
+        new_ayahs = [a for a in covered if a not in self.ayah_history] or covered[-1:]
+        for a in new_ayahs:
+            status = self.tracker.update(a)
+            self.ayah_history.append(a)
+            result["ayahs"].append((a, status))
+            log(f" Surah {surah}, Ayah {a} — {status.upper()} (score: {similarity:.2f})")
+        log("-" * 40)
+        result["status"] = result["ayahs"][-1][1]
+        return result
+
     def run_session(self):
+        # Imported here so batch users of SessionManager don't need a sound device
+        from utils.audio_utils import record_audio
+
         print("📿 Hifz Session Started. Begin reciting...\n")
         self.reset_session()
 
         try:
             while True:
                 audio_path = record_audio(duration=7, samplerate=16000)
-                transcript = transcribe_audio(audio_path)
+                transcript = transcribe_audio(audio_path, expected_text=self.expected_text())
                 print(f"Transcript: {transcript}")
-
-                # Match ayahs (filtered after session starts)
-                matches = find_most_similar_ayah(
-                    transcript,
-                    surah_filter=self.surah if self.session_active else None
-                )
-
-                if not matches:
-                    print("No match found.")
-                    continue
-
-                best = matches[0]
-                surah = best["surah"]
-                ayah = best["ayah"]
-                similarity = best["similarity"]
-
-                # Set appropriate similarity threshold
-                min_similarity = 0.59 if not self.session_active else 0.35
-                if similarity < min_similarity:
-                    print(f"Match below similarity threshold ({similarity:.2f} < {min_similarity}). Try again.")
-                    continue
-
-                # First ayah → start session
-                if not self.session_active:
-                    self.surah = surah
-                    self.tracker = HifzTracker(surah_num=surah, total_ayahs=999)  # TODO: pull actual count
-                    self.tracker.expected = ayah + 1
-                    self.ayah_history.append(ayah)
-                    self.session_active = True
-                    print(f"🎯 Starting session at Surah {surah}, Ayah {ayah}")
-                    continue
-
-                # Mid-session validation
-                if surah != self.surah:
-                    print(f" *WRONG SURAH* Expected Surah {self.surah}, got {surah}.")
-                    continue
-
-                status = self.tracker.update(ayah)
-                self.ayah_history.append(ayah)
-
-                print(f" Surah {surah}, Ayah {ayah} — {status.upper()} (score: {similarity:.2f})")
-                print("-" * 40)
+                self.process_transcript(transcript)
 
         except KeyboardInterrupt:
             print("\n🛑 Session ended by user.")
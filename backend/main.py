@@ -1,25 +1,56 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import func
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+import asyncio
 import tempfile
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional
 import uvicorn
 
 # Local imports
-from database import get_db, create_tables, get_or_create_user, User, TranscriptionLog, MemorizationStat
+from database import get_db, create_tables, get_or_create_user, record_ayah_attempt, User, TranscriptionLog, MemorizationStat, SurahProgress, UserStreak
 from auth import verify_firebase_token
-from ml.transcriber import transcribe_audio
+from rate_limit import rate_limit
+from ml.transcriber import transcribe_audio, transcription_stats
 from ml.ayah_matcher import match_ayah
+from ml.aligner import align_audio
+from ml import autotune, model_client
+from ml.scheduler import inference_scheduler, alignment_scheduler, QueueFullError
+from hifz.quran import ayah_count, TOTAL_AYAHS
+from utils.responses import json_response, make_etag, is_not_modified, not_modified
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# Only compress bodies big enough for it to pay off
+COMPRESSION_MIN_SIZE = 1024
+
+# Uploads are written here so a model server in another container can read
+# them; must be on a volume both mount when DHIKRA_MODEL_SOCKETS is set.
+UPLOAD_DIR = os.getenv("DHIKRA_UPLOAD_DIR") or None
+if UPLOAD_DIR:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Models this process runs itself when no model server is configured
+LOCAL_MODELS = ["transcribe", "match"]
+
+# History queries only look this far back, so they hit recent log partitions
+LOG_QUERY_DAYS = int(os.getenv("DHIKRA_LOG_QUERY_DAYS", "90"))
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Dhikra API",
     description="Qur'an Memorization Assistant API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -29,8 +60,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Brotli when available (falls back to gzip for clients that don't accept br)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
 # Pydantic models for requests/responses
 class TranscribeResponse(BaseModel):
     transcription: str
@@ -49,6 +87,17 @@ class MatchSentenceResponse(BaseModel):
     english_text: str
     success: bool
 
+class AyahAlignment(BaseModel):
+    ayah: int
+    start: Optional[float]
+    end: Optional[float]
+    score: float
+
+class AlignResponse(BaseModel):
+    surah: int
+    ayahs: List[AyahAlignment]
+    success: bool
+
 class TranscriptionLogResponse(BaseModel):
     id: str
     transcription_text: str
@@ -62,12 +111,40 @@ class MemorizationStatResponse(BaseModel):
     times_attempted: int
     last_attempted: datetime
 
+class SurahProgressResponse(BaseModel):
+    surah: int
+    ayahs_covered: int
+    total_ayahs: int
+    completion_percentage: float
+    total_attempts: int
+    last_attempted: datetime
+
+class MemorizationSummaryResponse(BaseModel):
+    total_ayahs_covered: int
+    completion_percentage: float
+    current_streak: int
+    longest_streak: int
+    surahs: List[SurahProgressResponse]
+    # "Weakest" means most attempts: ayahs recited more than once, most-repeated first
+    weakest_ayahs: List[MemorizationStatResponse]
+
 # Create tables on startup
 @app.on_event("startup")
 async def startup_event():
     create_tables()
     print("✅ Database tables created/verified")
 
+    # With a model server, tuning and warm-up happen in that process instead
+    if not model_client.enabled():
+        try:
+            autotune.configure_runtime(LOCAL_MODELS)
+            autotune.configure(LOCAL_MODELS)
+            if autotune.WARMUP:
+                autotune.warm_up(LOCAL_MODELS)
+                print("✅ Models warmed up")
+        except Exception as e:
+            print(f"Warning: Could not tune/warm up models: {e}")
+
 @app.get("/")
 async def root():
     return {"message": "Dhikra API is running", "version": "1.0.0"}
@@ -75,7 +152,7 @@ async def root():
 @app.post("/api/transcribe", response_model=TranscribeResponse)
 async def transcribe_endpoint(
     audio: UploadFile = File(...),
-    firebase_uid: str = Depends(verify_firebase_token),
+    firebase_uid: str = Depends(rate_limit("transcribe", per_minute=12, burst=4)),
     db: Session = Depends(get_db)
 ):
     """
@@ -87,14 +164,18 @@ async def transcribe_endpoint(
             raise HTTPException(status_code=400, detail="File must be an audio file")
         
         # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav", dir=UPLOAD_DIR) as temp_file:
             content = await audio.read()
             temp_file.write(content)
             temp_file_path = temp_file.name
         
         try:
-            # Transcribe audio
-            transcription = transcribe_audio(temp_file_path)
+            # Transcribe audio, taking turns with other users' uploads
+            try:
+                job = inference_scheduler.submit(firebase_uid, transcribe_audio, temp_file_path)
+            except QueueFullError:
+                raise HTTPException(status_code=429, detail="Too many transcriptions in progress")
+            transcription = await asyncio.wrap_future(job)
             
             return TranscribeResponse(
                 transcription=transcription,
@@ -107,13 +188,64 @@ async def transcribe_endpoint(
             if os.path.exists(temp_file_path):
                 os.unlink(temp_file_path)
     
+    except HTTPException:
+        raise
+    except model_client.ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
+@app.post("/api/align", response_model=AlignResponse)
+async def align_endpoint(
+    audio: UploadFile = File(...),
+    surah: int = Form(...),
+    start_ayah: int = Form(1),
+    end_ayah: Optional[int] = Form(None),
+    firebase_uid: str = Depends(rate_limit("align", per_minute=2, burst=2))
+):
+    """
+    Align a full-surah recording to its ayahs in a single CTC pass
+    """
+    try:
+        if not audio.content_type.startswith('audio/'):
+            raise HTTPException(status_code=400, detail="File must be an audio file")
+        if not 1 <= surah <= 114:
+            raise HTTPException(status_code=400, detail="Surah must be between 1 and 114")
+        
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav", dir=UPLOAD_DIR) as temp_file:
+            content = await audio.read()
+            temp_file.write(content)
+            temp_file_path = temp_file.name
+        
+        try:
+            try:
+                job = alignment_scheduler.submit(
+                    firebase_uid, align_audio, temp_file_path, surah,
+                    start_ayah=start_ayah, end_ayah=end_ayah
+                )
+            except QueueFullError:
+                raise HTTPException(status_code=429, detail="An alignment is already in progress")
+            ayahs = await asyncio.wrap_future(job)
+            
+            return AlignResponse(surah=surah, ayahs=ayahs, success=True)
+        
+        finally:
+            if os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
+    
+    except HTTPException:
+        raise
+    except model_client.ModelUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Alignment failed: {str(e)}")
+
 @app.post("/api/match_sentence", response_model=MatchSentenceResponse)
 async def match_sentence_endpoint(
     request: MatchSentenceRequest,
-    firebase_uid: str = Depends(verify_firebase_token),
+    firebase_uid: str = Depends(rate_limit("match_sentence", per_minute=60, burst=10)),
     db: Session = Depends(get_db)
 ):
     """
@@ -123,8 +255,8 @@ async def match_sentence_endpoint(
         # Get or create user
         user = get_or_create_user(db, firebase_uid)
         
-        # Match ayah
-        match_result = match_ayah(request.sentence)
+        # Match ayah off the event loop; it may wait on the encoder or a model server
+        match_result = await run_in_threadpool(match_ayah, request.sentence)
         
         # Log transcription
         log_entry = TranscriptionLog(
@@ -135,25 +267,9 @@ async def match_sentence_endpoint(
         )
         db.add(log_entry)
         
-        # Update or insert memorization stats
+        # Update memorization stats and per-surah aggregates
         if match_result["surah"] and match_result["ayah"]:
-            existing_stat = db.query(MemorizationStat).filter(
-                MemorizationStat.user_id == user.id,
-                MemorizationStat.surah == match_result["surah"],
-                MemorizationStat.ayah == match_result["ayah"]
-            ).first()
-            
-            if existing_stat:
-                existing_stat.times_attempted += 1
-                existing_stat.last_attempted = datetime.utcnow()
-            else:
-                new_stat = MemorizationStat(
-                    user_id=user.id,
-                    surah=match_result["surah"],
-                    ayah=match_result["ayah"],
-                    times_attempted=1
-                )
-                db.add(new_stat)
+            record_ayah_attempt(db, user.id, match_result["surah"], match_result["ayah"])
         
         db.commit()
         
@@ -167,12 +283,16 @@ async def match_sentence_endpoint(
             success=True
         )
     
+    except model_client.ModelUnavailableError as e:
+        db.rollback()
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Matching failed: {str(e)}")
 
 @app.get("/api/transcription_logs", response_model=List[TranscriptionLogResponse])
 async def get_transcription_logs(
+    request: Request,
     firebase_uid: str = Depends(verify_firebase_token),
     db: Session = Depends(get_db),
     limit: int = 50
@@ -183,26 +303,34 @@ async def get_transcription_logs(
     try:
         user = get_or_create_user(db, firebase_uid)
         
-        logs = db.query(TranscriptionLog).filter(
-            TranscriptionLog.user_id == user.id
+        rows = db.query(
+            TranscriptionLog.id,
+            TranscriptionLog.transcription_text,
+            TranscriptionLog.matched_ayah,
+            TranscriptionLog.similarity_score,
+            TranscriptionLog.created_at
+        ).filter(
+            TranscriptionLog.user_id == user.id,
+            TranscriptionLog.created_at >= datetime.utcnow() - timedelta(days=LOG_QUERY_DAYS)
         ).order_by(TranscriptionLog.created_at.desc()).limit(limit).all()
         
-        return [
-            TranscriptionLogResponse(
-                id=str(log.id),
-                transcription_text=log.transcription_text,
-                matched_ayah=log.matched_ayah,
-                similarity_score=log.similarity_score,
-                created_at=log.created_at
-            )
-            for log in logs
-        ]
+        return json_response(request, [
+            {
+                "id": str(log_id),
+                "transcription_text": text,
+                "matched_ayah": matched_ayah,
+                "similarity_score": similarity_score,
+                "created_at": created_at
+            }
+            for log_id, text, matched_ayah, similarity_score, created_at in rows
+        ])
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get logs: {str(e)}")
 
 @app.get("/api/memorization_stats", response_model=List[MemorizationStatResponse])
 async def get_memorization_stats(
+    request: Request,
     firebase_uid: str = Depends(verify_firebase_token),
     db: Session = Depends(get_db),
     surah: Optional[int] = None
@@ -213,34 +341,124 @@ async def get_memorization_stats(
     try:
         user = get_or_create_user(db, firebase_uid)
         
-        query = db.query(MemorizationStat).filter(MemorizationStat.user_id == user.id)
-        
+        filters = [MemorizationStat.user_id == user.id]
         if surah:
-            query = query.filter(MemorizationStat.surah == surah)
+            filters.append(MemorizationStat.surah == surah)
+        
+        # Every match bumps times_attempted, so this aggregate changes whenever
+        # the list does; answer 304 before fetching any rows.
+        count, attempts, latest = db.query(
+            func.count(MemorizationStat.id),
+            func.sum(MemorizationStat.times_attempted),
+            func.max(MemorizationStat.last_attempted)
+        ).filter(*filters).one()
+        etag = make_etag(user.id, surah, count, attempts, latest)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
         
-        stats = query.order_by(
+        rows = db.query(
+            MemorizationStat.surah,
+            MemorizationStat.ayah,
+            MemorizationStat.times_attempted,
+            MemorizationStat.last_attempted
+        ).filter(*filters).order_by(
             MemorizationStat.surah.asc(),
             MemorizationStat.ayah.asc()
         ).all()
         
-        return [
-            MemorizationStatResponse(
-                surah=stat.surah,
-                ayah=stat.ayah,
-                times_attempted=stat.times_attempted,
-                last_attempted=stat.last_attempted
-            )
-            for stat in stats
-        ]
+        return json_response(request, [
+            {
+                "surah": stat_surah,
+                "ayah": ayah,
+                "times_attempted": times_attempted,
+                "last_attempted": last_attempted
+            }
+            for stat_surah, ayah, times_attempted, last_attempted in rows
+        ], etag=etag)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
+@app.get("/api/memorization_summary", response_model=MemorizationSummaryResponse)
+async def get_memorization_summary(
+    firebase_uid: str = Depends(verify_firebase_token),
+    db: Session = Depends(get_db),
+    weakest_limit: int = 10
+):
+    """
+    Get per-surah coverage, streaks and weakest ayahs from the precomputed
+    aggregates rather than every stat row. Weakest ayahs are those with the
+    most attempts (times_attempted > 1, highest first, up to weakest_limit).
+    """
+    try:
+        user = get_or_create_user(db, firebase_uid)
+        
+        # Streak and per-surah progress in one round-trip; the user row
+        # anchors the outer joins so either side may be missing.
+        rows = db.query(UserStreak, SurahProgress).select_from(User).outerjoin(
+            UserStreak, UserStreak.user_id == User.id
+        ).outerjoin(
+            SurahProgress, SurahProgress.user_id == User.id
+        ).filter(User.id == user.id).order_by(SurahProgress.surah.asc()).all()
+        streak = rows[0][0] if rows else None
+        progress = [p for _, p in rows if p is not None]
+        
+        # Ayahs the user has needed the most attempts on
+        weakest = db.query(MemorizationStat).filter(
+            MemorizationStat.user_id == user.id,
+            MemorizationStat.times_attempted > 1
+        ).order_by(MemorizationStat.times_attempted.desc()).limit(weakest_limit).all()
+        
+        current_streak = 0
+        longest_streak = 0
+        if streak:
+            longest_streak = streak.longest_streak
+            # A streak is broken once a full day passes without recitation
+            if streak.last_active_date and streak.last_active_date >= datetime.utcnow().date() - timedelta(days=1):
+                current_streak = streak.current_streak
+        
+        total_covered = sum(p.ayahs_covered for p in progress)
+        
+        return MemorizationSummaryResponse(
+            total_ayahs_covered=total_covered,
+            completion_percentage=round(100.0 * total_covered / TOTAL_AYAHS, 2),
+            current_streak=current_streak,
+            longest_streak=longest_streak,
+            surahs=[
+                SurahProgressResponse(
+                    surah=p.surah,
+                    ayahs_covered=p.ayahs_covered,
+                    total_ayahs=ayah_count(p.surah),
+                    completion_percentage=round(100.0 * p.ayahs_covered / ayah_count(p.surah), 2),
+                    total_attempts=p.total_attempts,
+                    last_attempted=p.last_attempted
+                )
+                for p in progress
+            ],
+            weakest_ayahs=[
+                MemorizationStatResponse(
+                    surah=stat.surah,
+                    ayah=stat.ayah,
+                    times_attempted=stat.times_attempted,
+                    last_attempted=stat.last_attempted
+                )
+                for stat in weakest
+            ]
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get summary: {str(e)}")
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "dhikra-api"}
 
+@app.get("/api/metrics/transcription")
+async def transcription_metrics():
+    """Per-tier request counts and escalation rates of the cascading transcriber"""
+    return {"tiers": transcription_stats()}
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
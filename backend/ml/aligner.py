@@ -0,0 +1,264 @@
+"""
+Single-pass CTC forced alignment of a full recitation against the surah text.
+
+Runs ArabicWav2Vec2 once over the recording (in overlapping windows) and
+Viterbi-aligns the frame log-probabilities to the known Arabic text from
+ayah_dataset.csv, giving start/end times and a score for every ayah.
+
+    python -m ml.aligner recording.wav --surah 67
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import unicodedata
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml import model_client
+
+DATASET_PATH = "data/ayah_dataset.csv"
+
+# Letter variants in the Uthmani text that the model's vocabulary spells plainly
+LETTER_MAP = {"ٱ": "ا"}
+
+_aligner_model = None
+
+
+def load_ayahs(surah, start_ayah=1, end_ayah=None, dataset_path=DATASET_PATH):
+    """
+    Arabic text of a surah's ayahs.
+
+    Returns:
+        list[tuple[int, str]]: (ayah number, arabic text) in order.
+    """
+    with open(dataset_path, newline="", encoding="utf-8") as f:
+        return [
+            (int(row["ayah"]), row["arabic_text"])
+            for row in csv.DictReader(f)
+            if int(row["surah"]) == surah
+            and int(row["ayah"]) >= start_ayah
+            and (end_ayah is None or int(row["ayah"]) <= end_ayah)
+        ]
+
+
+def normalize_arabic(text, vocab, word_delimiter="|"):
+    """
+    Reduce Uthmani text to the characters the CTC model can emit.
+
+    Drops diacritics and Qur'anic annotation marks (combining characters),
+    maps letter variants, turns spaces into the word delimiter and discards
+    anything else outside the vocabulary.
+    """
+    chars = []
+    for ch in text:
+        if unicodedata.category(ch) == "Mn":
+            continue
+        ch = LETTER_MAP.get(ch, ch)
+        if ch.isspace():
+            ch = word_delimiter
+        if ch not in vocab:
+            continue
+        if ch == word_delimiter and (not chars or chars[-1] == word_delimiter):
+            continue
+        chars.append(ch)
+    while chars and chars[-1] == word_delimiter:
+        chars.pop()
+    return chars
+
+
+def _viterbi_step(prev, skip_allowed):
+    """Best predecessor for every state: stay, advance one, or skip a blank."""
+    adv1 = np.full_like(prev, -np.inf)
+    adv1[1:] = prev[:-1]
+    adv2 = np.full_like(prev, -np.inf)
+    adv2[2:] = np.where(skip_allowed[2:], prev[:-2], -np.inf)
+    candidates = np.stack([prev, adv1, adv2])
+    choice = np.argmax(candidates, axis=0).astype(np.uint8)
+    return np.take_along_axis(candidates, choice[None].astype(np.int64), axis=0)[0], choice
+
+
+def ctc_forced_align(log_probs, tokens, blank=0, checkpoint_every=None):
+    """
+    Viterbi CTC alignment of `tokens` to `log_probs`.
+
+    Memory is O(sqrt(T) * S) rather than O(T * S): the forward pass keeps
+    only periodic checkpoints of the scores, and backtracking recomputes
+    back-pointers one checkpoint interval at a time.
+
+    Args:
+        log_probs (np.ndarray): (T, V) frame log-probabilities.
+        tokens (list[int]): Target token ids (no blanks).
+        blank (int): Blank token id.
+        checkpoint_every (int): Frames between checkpoints (default sqrt(T)).
+
+    Returns:
+        tuple[np.ndarray, float]: Token index per frame (-1 for blank frames)
+        and the path's total log-probability.
+
+    Raises:
+        ValueError: If the recording has too few frames for the text.
+    """
+    T = len(log_probs)
+    ext = np.full(2 * len(tokens) + 1, blank, dtype=np.int64)
+    ext[1::2] = tokens
+    S = len(ext)
+
+    repeats = sum(1 for a, b in zip(tokens, tokens[1:]) if a == b)
+    if T < len(tokens) + repeats:
+        raise ValueError(f"Recording too short to align {len(tokens)} tokens in {T} frames")
+
+    skip_allowed = np.zeros(S, dtype=bool)
+    skip_allowed[2:] = (ext[2:] != blank) & (ext[2:] != ext[:-2])
+
+    k = checkpoint_every or max(int(np.sqrt(T)), 1)
+
+    scores = np.full(S, -np.inf)
+    scores[0] = log_probs[0, ext[0]]
+    if S > 1:
+        scores[1] = log_probs[0, ext[1]]
+
+    checkpoints = {0: scores.copy()}
+    for t in range(1, T):
+        scores, _ = _viterbi_step(scores, skip_allowed)
+        scores += log_probs[t, ext]
+        if t % k == 0:
+            checkpoints[t] = scores.copy()
+
+    state = S - 1 if S == 1 or scores[S - 1] >= scores[S - 2] else S - 2
+    total = float(scores[state])
+
+    path = np.empty(T, dtype=np.int64)
+    path[T - 1] = state
+    for seg_start in range((T - 1) // k * k, -1, -k):
+        # Recompute back-pointers for frames seg_start+1 .. seg_end, whose
+        # last state is already known from the later segment (or the end)
+        seg_end = min(seg_start + k, T - 1)
+        scores = checkpoints[seg_start]
+        choices = []
+        for t in range(seg_start + 1, seg_end + 1):
+            scores, choice = _viterbi_step(scores, skip_allowed)
+            scores += log_probs[t, ext]
+            choices.append(choice)
+        for t in range(seg_end, seg_start, -1):
+            path[t - 1] = path[t] - choices[t - seg_start - 1][path[t]]
+
+    token_index = np.where(path % 2 == 1, (path - 1) // 2, -1)
+    return token_index, total
+
+
+def align_ayahs(log_probs, ayahs, vocab, blank, word_delimiter="|", frame_seconds=0.02):
+    """
+    Align normalized ayah texts to frame log-probabilities.
+
+    Args:
+        log_probs (np.ndarray): (T, V) frame log-probabilities.
+        ayahs (list[tuple[int, str]]): (ayah number, arabic text) in recitation order.
+        vocab (dict): Character -> token id.
+        blank (int): Blank token id.
+        frame_seconds (float): Duration of one frame.
+
+    Returns:
+        list[dict]: One entry per ayah with ayah, start, end (seconds) and
+        score (mean probability of the ayah's aligned characters, 0–1).
+    """
+    tokens, owner = [], []
+    for i, (_, text) in enumerate(ayahs):
+        chars = normalize_arabic(text, vocab, word_delimiter)
+        if tokens and chars:
+            # The pause between ayahs belongs to neither of them
+            tokens.append(vocab[word_delimiter])
+            owner.append(-1)
+        tokens.extend(vocab[c] for c in chars)
+        owner.extend([i] * len(chars))
+
+    token_index, _ = ctc_forced_align(log_probs, tokens, blank=blank)
+    owner = np.array(owner)
+
+    results = []
+    frames = np.arange(len(token_index))
+    emitted = token_index >= 0
+    frame_owner = np.where(emitted, owner[np.clip(token_index, 0, None)], -1)
+    frame_prob = np.exp(log_probs[frames, np.array(tokens)[np.clip(token_index, 0, None)]])
+
+    for i, (ayah, _) in enumerate(ayahs):
+        mine = frames[frame_owner == i]
+        if len(mine) == 0:
+            results.append({"ayah": ayah, "start": None, "end": None, "score": 0.0})
+            continue
+        results.append({
+            "ayah": ayah,
+            "start": round(float(mine[0] * frame_seconds), 2),
+            "end": round(float((mine[-1] + 1) * frame_seconds), 2),
+            "score": round(float(frame_prob[mine].mean()), 4),
+        })
+    return results
+
+
+def get_aligner_model():
+    global _aligner_model
+    if _aligner_model is None:
+        from ml.models.wav2vec2_model import ArabicWav2Vec2
+        _aligner_model = ArabicWav2Vec2()
+    return _aligner_model
+
+
+def align_recording(audio_path, surah, start_ayah=1, end_ayah=None):
+    """
+    Per-ayah timestamps for a recitation of (part of) a surah.
+
+    Args:
+        audio_path (str): Path to the recording.
+        surah (int): Surah being recited.
+        start_ayah (int): First ayah in the recording.
+        end_ayah (int): Last ayah in the recording (default: end of surah).
+
+    Returns:
+        list[dict]: ayah, start, end (seconds) and score for each ayah.
+    """
+    from ml.models.wav2vec2_model import SAMPLE_RATE
+
+    model = get_aligner_model()
+    tokenizer = model.processor.tokenizer
+    ayahs = load_ayahs(surah, start_ayah, end_ayah)
+    if not ayahs:
+        raise ValueError(f"No ayahs found for Surah {surah} from ayah {start_ayah}")
+
+    log_probs = model.frame_log_probs(audio_path)
+    return align_ayahs(
+        log_probs,
+        ayahs,
+        vocab=tokenizer.get_vocab(),
+        blank=tokenizer.pad_token_id,
+        word_delimiter=tokenizer.word_delimiter_token,
+        frame_seconds=model.samples_per_frame / SAMPLE_RATE,
+    )
+
+
+def align_audio(audio_path, surah, start_ayah=1, end_ayah=None):
+    """
+    align_recording, run on a model server when model servers are configured
+    (never loading wav2vec2 in an API worker).
+    """
+    if model_client.enabled():
+        return model_client.call("align", audio_path, surah, start_ayah=start_ayah, end_ayah=end_ayah)
+    return align_recording(audio_path, surah, start_ayah, end_ayah)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align a full-surah recording to its ayahs")
+    parser.add_argument("audio")
+    parser.add_argument("--surah", type=int, required=True)
+    parser.add_argument("--start-ayah", type=int, default=1)
+    parser.add_argument("--end-ayah", type=int)
+    args = parser.parse_args()
+
+    for row in align_recording(args.audio, args.surah, args.start_ayah, args.end_ayah):
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
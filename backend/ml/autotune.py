@@ -0,0 +1,240 @@
+"""
+Per-host tuning of inference threading.
+
+Benchmarks the models a process serves on the bundled warm-up clip across
+thread counts, picks the one with the lowest per-call latency for the
+one-call-per-model concurrency each process actually runs, and caches it in a
+small JSON profile per host. Requests are single clips and single queries, so
+there is no batch size to tune online. Controlled by DHIKRA_AUTOTUNE:
+
+    off        use fixed settings (default)
+    cached     apply the host profile if one exists
+    calibrate  apply the host profile, calibrating first if there is none
+"""
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+
+AUTOTUNE_MODE = os.getenv("DHIKRA_AUTOTUNE", "off")
+PROFILE_DIR = os.getenv("DHIKRA_TUNING_DIR", "data/tuning")
+WARMUP_CLIP = os.getenv("DHIKRA_WARMUP_CLIP", "sample_recitation.wav")
+WARMUP = os.getenv("DHIKRA_WARMUP", "1") != "0"
+WARMUP_TEXT = "In the name of Allah, the Entirely Merciful, the Especially Merciful."
+WARMUP_SURAH = 1  # surah the warm-up clip is aligned against
+# One call per model runs at a time, so inter-op parallelism only oversubscribes
+INTEROP_THREADS = int(os.getenv("DHIKRA_TORCH_INTEROP_THREADS", "1"))
+
+# Models that run on torch; a match-only process using the ONNX encoder never imports it
+TORCH_MODELS = {"transcribe", "align"}
+
+
+def profile_path(host=None):
+    return os.path.join(PROFILE_DIR, f"{host or socket.gethostname()}.json")
+
+
+def _signature(models):
+    """Settings a profile depends on; a mismatch invalidates it."""
+    from ml import transcriber
+
+    signature = {"cpu_count": os.cpu_count(), "models": sorted(models)}
+    if "transcribe" in models:
+        signature["whisper"] = [transcriber.FAST_WHISPER_MODEL, transcriber.WHISPER_MODEL]
+    if "match" in models:
+        from scripts.ayah_matcher import model as encoder
+        signature["encoder"] = type(encoder).__name__
+    return signature
+
+
+def thread_candidates(cpu_count=None):
+    """Powers of two up to the core count, plus the core count itself."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    candidates = []
+    threads = 1
+    while threads < cpu_count:
+        candidates.append(threads)
+        threads *= 2
+    candidates.append(cpu_count)
+    return candidates
+
+
+def _best_time(fn, repeats=2):
+    fn()  # first call pays one-time allocations
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _pick(latencies):
+    """
+    Fastest thread count, preferring fewer threads when within 5% of it so
+    spare cores stay free for other processes.
+    """
+    fastest = min(latencies.values())
+    return min(t for t, latency in latencies.items() if latency <= fastest * 1.05)
+
+
+def calibrate(models):
+    """
+    Benchmark the given models and return a tuning profile.
+
+    Each process runs one call per model at a time (the model server locks
+    per model, and the schedulers default to one worker each), so the best
+    setting is the one with the lowest per-call latency.
+
+    Args:
+        models (list[str]): Subset of ("transcribe", "match", "align").
+
+    Returns:
+        dict or None: torch_threads and the raw benchmark timings, or None if
+        none of the models can be benchmarked here.
+    """
+    benchmarks = {}
+    latencies = {model: {} for model in ("transcribe", "align", "match")}
+
+    for threads in thread_candidates():
+        apply_threads(models, threads)
+
+        if "transcribe" in models:
+            from ml import transcriber
+            latency = _best_time(lambda: transcriber.transcribe_local(WARMUP_CLIP), repeats=1)
+            latencies["transcribe"][threads] = latency
+
+        if "align" in models:
+            from ml import aligner
+            latency = _best_time(lambda: aligner.align_recording(WARMUP_CLIP, WARMUP_SURAH), repeats=1)
+            latencies["align"][threads] = latency
+
+        if "match" in models:
+            from scripts.ayah_matcher import model as encoder
+            latency = _best_time(lambda: encoder.encode([WARMUP_TEXT]))
+            latencies["match"][threads] = latency
+
+        for model, by_threads in latencies.items():
+            if threads in by_threads:
+                benchmarks[f"{model}/threads={threads}"] = round(by_threads[threads], 4)
+
+    # Whisper dominates when it is served (it handles most requests); the
+    # aligner or the encoder only pick the thread count without it.
+    chosen = latencies["transcribe"] or latencies["align"] or latencies["match"]
+    if not chosen:
+        return None
+
+    return {
+        "torch_threads": _pick(chosen),
+        "benchmarks": benchmarks,
+    }
+
+
+def load_profile(models, host=None):
+    """The cached profile for this host, or None if missing or stale."""
+    path = profile_path(host)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        profile = json.load(f)
+    if profile.get("signature") != _signature(models):
+        return None
+    return profile
+
+
+def save_profile(profile, host=None):
+    path = profile_path(host)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+def configure_runtime(models):
+    """
+    Process-wide settings that must be in place before any inference runs:
+    a single tokenizers thread pool off, and torch's inter-op pool capped.
+    Existing environment settings win.
+    """
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    if TORCH_MODELS & set(models):
+        import torch
+        try:
+            torch.set_num_interop_threads(INTEROP_THREADS)
+        except RuntimeError:
+            # Only settable before torch's first parallel op; keep what's there.
+            pass
+
+
+def apply_threads(models, threads):
+    """
+    Limit the models served by this process to `threads` intra-op threads.
+
+    torch is only configured when a torch model is served (or torch is already
+    loaded, e.g. by the PyTorch sentence encoder); the ONNX encoder gets its
+    own session setting.
+    """
+    if TORCH_MODELS & set(models) or "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+    if "match" in models:
+        from scripts import ayah_matcher
+        ayah_matcher.set_encoder_threads(threads)
+
+
+def apply_profile(profile, models):
+    """Apply the profile's thread count to this process's models."""
+    apply_threads(models, profile["torch_threads"])
+
+
+def warm_up(models):
+    """Run one inference per model so the first request skips one-time costs."""
+    if "transcribe" in models and os.path.exists(WARMUP_CLIP):
+        from ml import transcriber
+        transcriber.transcribe_local(WARMUP_CLIP)
+        transcriber.reset_transcription_stats()
+    if "align" in models and os.path.exists(WARMUP_CLIP):
+        from ml import aligner
+        aligner.align_recording(WARMUP_CLIP, WARMUP_SURAH)
+    if "match" in models:
+        from ml.ayah_matcher import match_ayah_local
+        match_ayah_local(WARMUP_TEXT)
+
+
+def configure(models, mode=AUTOTUNE_MODE):
+    """
+    Apply (and if needed create) the host profile according to `mode`.
+
+    Args:
+        models (list[str]): Models served by this process.
+        mode (str): "off", "cached" or "calibrate".
+
+    Returns:
+        dict or None: The applied profile.
+    """
+    if mode == "off":
+        return None
+
+    profile = load_profile(models)
+    if profile is None and mode == "calibrate":
+        if not os.path.exists(WARMUP_CLIP) and TORCH_MODELS & set(models):
+            print(f"Warning: warm-up clip {WARMUP_CLIP} not found; skipping calibration")
+            return None
+        print("⏱️ Calibrating inference settings for this host...")
+        profile = calibrate(models)
+        if profile is None:
+            print("Warning: nothing to calibrate for these models")
+            return None
+        if "transcribe" in models:
+            from ml import transcriber
+            transcriber.reset_transcription_stats()
+        profile["signature"] = _signature(models)
+        profile["created_at"] = datetime.utcnow().isoformat()
+        print(f"Saved tuning profile to {save_profile(profile)}")
+
+    if profile is None:
+        return None
+    apply_profile(profile, models)
+    print(f"✅ Using {profile['torch_threads']} torch threads")
+    return profile
@@ -2,9 +2,18 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from scripts.ayah_matcher import find_most_similar_ayah
+from ml import model_client
 
 def match_ayah(sentence: str, top_k: int = 1, surah_filter=None):
+    """
+    Match a sentence to an ayah, delegating to a model server when one is
+    configured so API workers don't each hold the encoder and embeddings.
+    """
+    if model_client.enabled():
+        return model_client.call("match", sentence, top_k=top_k, surah_filter=surah_filter)
+    return match_ayah_local(sentence, top_k=top_k, surah_filter=surah_filter)
+
+def match_ayah_local(sentence: str, top_k: int = 1, surah_filter=None):
     """
     Wrapper function for the existing find_most_similar_ayah function
     to match the API specification.
@@ -17,6 +26,8 @@ def match_ayah(sentence: str, top_k: int = 1, surah_filter=None):
     Returns:
         dict: Best matched ayah with similarity score and metadata
     """
+    from scripts.ayah_matcher import find_most_similar_ayah
+
     results = find_most_similar_ayah(sentence, top_k=top_k, surah_filter=surah_filter)
     
     if not results:
@@ -0,0 +1,156 @@
+"""
+Client side of the model server (see ml/model_server.py).
+
+When DHIKRA_MODEL_SOCKETS is set, API workers forward inference calls over
+local Unix sockets instead of loading Whisper and the sentence encoder in
+every process. Each socket is probed once for the methods it serves, and
+calls are spread round-robin across the servers that offer a method.
+"""
+import itertools
+import os
+import threading
+from multiprocessing.connection import Client
+
+MODEL_SOCKETS = [p.strip() for p in os.getenv("DHIKRA_MODEL_SOCKETS", "").split(",") if p.strip()]
+# Model servers unpickle whatever an authenticated client sends, so there is
+# deliberately no default key.
+AUTHKEY = os.getenv("DHIKRA_MODEL_AUTHKEY", "").encode()
+
+
+class ModelServerError(RuntimeError):
+    """Raised when no model server can answer a call, or the call itself failed."""
+
+
+class ModelUnavailableError(ModelServerError):
+    """Raised when no configured model server currently offers a method."""
+
+
+_routes = None
+_methods = {}
+_routes_lock = threading.Lock()
+_local = threading.local()
+
+
+def require_authkey():
+    """Refuse to talk over model-server sockets without a shared secret."""
+    if not AUTHKEY:
+        raise RuntimeError("DHIKRA_MODEL_AUTHKEY must be set to a random secret shared by the API and model servers")
+
+
+if MODEL_SOCKETS:
+    require_authkey()
+
+
+def enabled() -> bool:
+    """True if inference should be delegated to model-server processes."""
+    return bool(MODEL_SOCKETS)
+
+
+def _connection(socket_path):
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(socket_path)
+    if conn is None:
+        conn = Client(socket_path, family="AF_UNIX", authkey=AUTHKEY)
+        conns[socket_path] = conn
+    return conn
+
+
+def _drop(socket_path):
+    conn = getattr(_local, "conns", {}).pop(socket_path, None)
+    if conn is not None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def _request(socket_path, method, args, kwargs):
+    """Send one request, reconnecting once if the server was restarted."""
+    for attempt in range(2):
+        try:
+            conn = _connection(socket_path)
+            conn.send((method, args, kwargs))
+            status, payload = conn.recv()
+            break
+        except (EOFError, OSError):
+            _drop(socket_path)
+            if attempt:
+                raise
+    if status != "ok":
+        if isinstance(payload, Exception):
+            raise payload
+        raise ModelServerError(payload)
+    return payload
+
+
+def _load_routes():
+    """Ask every configured socket which methods it serves."""
+    global _routes
+    with _routes_lock:
+        if _routes is None:
+            by_method = {}
+            for path in MODEL_SOCKETS:
+                try:
+                    methods = _request(path, "methods", (), {})
+                except (EOFError, OSError) as e:
+                    print(f"Warning: model server at {path} unavailable: {e}")
+                    continue
+                _methods[path] = set(methods)
+                for method in methods:
+                    by_method.setdefault(method, []).append(path)
+            _routes = {m: itertools.cycle(paths) for m, paths in by_method.items()}
+        return _routes
+
+
+def _route(method):
+    """
+    Servers offering `method`, re-probing once on a miss in case a server was
+    still starting (or restarting) when the routes were last loaded.
+    """
+    global _routes
+    routes = _load_routes()
+    if method not in routes:
+        with _routes_lock:
+            _routes = None
+        routes = _load_routes()
+    return routes.get(method)
+
+
+def provides(method) -> bool:
+    """True if at least one configured model server offers `method`."""
+    return enabled() and _route(method) is not None
+
+
+def call(method, *args, **kwargs):
+    """
+    Run `method` on one of the model servers that provides it.
+
+    Args:
+        method (str): Handler name, e.g. "transcribe" or "match".
+
+    Returns:
+        Whatever the server-side handler returned.
+
+    Raises:
+        ModelUnavailableError: If no server offers the method.
+        ModelServerError: If the handler failed with a non-built-in exception;
+            built-in ones (ValueError, KeyError, ...) are re-raised unchanged.
+    """
+    paths = _route(method)
+    if paths is None:
+        raise ModelUnavailableError(f"No model server provides '{method}'")
+    return _request(next(paths), method, args, kwargs)
+
+
+def call_all(method, *args, **kwargs):
+    """
+    Run `method` on every model server that provides it.
+
+    Returns:
+        list: One result per server, e.g. to aggregate per-process counters.
+    """
+    _load_routes()
+    paths = [p for p in MODEL_SOCKETS if method in _methods.get(p, ())]
+    return [_request(path, method, args, kwargs) for path in paths]
@@ -0,0 +1,169 @@
+"""
+Standalone model-server process.
+
+Owns one or more models and answers inference calls from API workers over a
+Unix socket, so uvicorn can run several lightweight workers without each one
+loading Whisper and the sentence encoder. Run one server per model (or one for
+both) and point the API at them with DHIKRA_MODEL_SOCKETS. Every process must
+share a secret DHIKRA_MODEL_AUTHKEY:
+
+    export DHIKRA_MODEL_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python -m ml.model_server --socket /tmp/dhikra-whisper.sock --models transcribe --threads 4
+    python -m ml.model_server --socket /tmp/dhikra-matcher.sock --models match --threads 1
+    DHIKRA_MODEL_SOCKETS=/tmp/dhikra-whisper.sock,/tmp/dhikra-matcher.sock uvicorn main:app --workers 4
+"""
+import argparse
+import os
+import sys
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml import autotune
+from ml.model_client import AUTHKEY, require_authkey
+
+AVAILABLE_MODELS = ("transcribe", "match", "align")
+
+# Model each method runs on. Calls on one model are serialized, calls on
+# different models run side by side; methods not listed (cheap read-only
+# ones like transcription_stats) never wait.
+METHOD_MODELS = {
+    "transcribe": "transcribe",
+    "transcribe_expected": "transcribe",
+    "match": "match",
+    "align": "align",
+}
+
+
+def load_handlers(models):
+    """
+    Import and warm the requested models in this process.
+
+    Args:
+        models (list[str]): Subset of AVAILABLE_MODELS.
+
+    Returns:
+        dict: method name -> callable
+    """
+    handlers = {}
+    if "transcribe" in models:
+        from ml import transcriber
+        transcriber.LOCAL_MATCH = "match" in models
+        transcriber.load_models()
+        handlers["transcribe"] = transcriber.transcribe_local
+        handlers["transcribe_expected"] = transcriber.transcribe_expected_local
+        handlers["transcription_stats"] = transcriber.transcription_stats_local
+    if "match" in models:
+        from ml.ayah_matcher import match_ayah_local
+        handlers["match"] = match_ayah_local
+    if "align" in models:
+        from ml import aligner
+        aligner.get_aligner_model()
+        handlers["align"] = aligner.align_recording
+    return handlers
+
+
+def _handle(conn, handlers, locks):
+    """Serve requests from one API worker until it disconnects."""
+    with conn:
+        while True:
+            try:
+                method, args, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            if method == "methods":
+                conn.send(("ok", sorted(handlers)))
+                continue
+
+            handler = handlers.get(method)
+            if handler is None:
+                conn.send(("error", f"Unknown method '{method}'"))
+                continue
+
+            try:
+                lock = locks.get(METHOD_MODELS.get(method))
+                if lock is None:
+                    result = handler(*args, **kwargs)
+                else:
+                    # A model is not safe to run concurrently; torch already
+                    # uses the pinned intra-op threads for a single call.
+                    with lock:
+                        result = handler(*args, **kwargs)
+                conn.send(("ok", result))
+            except Exception as e:
+                # Built-in exceptions (e.g. ValueError for a bad ayah range)
+                # are re-raised as-is by the client; anything else would need
+                # the server's modules to unpickle, so it is sent as text.
+                if type(e).__module__ == "builtins":
+                    conn.send(("error", e))
+                else:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def serve(socket_path, models, threads=None):
+    """
+    Load `models`, pin them to `threads` intra-op threads, and serve forever.
+
+    Without an explicit thread count the host's tuning profile is used (see
+    ml/autotune.py), falling back to a single thread.
+    """
+    require_authkey()
+
+    # Only torch models pay for importing torch; an ONNX matcher stays torch-free
+    autotune.configure_runtime(models)
+    if threads:
+        autotune.apply_threads(models, threads)
+
+    handlers = load_handlers(models)
+
+    if not threads:
+        profile = autotune.configure(models)
+        threads = profile["torch_threads"] if profile else 1
+    autotune.apply_threads(models, threads)
+
+    if autotune.WARMUP:
+        autotune.warm_up(models)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = Listener(socket_path, family="AF_UNIX", authkey=AUTHKEY)
+    print(f"✅ Model server ({', '.join(sorted(handlers))}) listening on {socket_path} with {threads} threads")
+
+    locks = {model: threading.Lock() for model in models}
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                # Failed handshake (e.g. wrong authkey); keep serving others.
+                print(f"Warning: rejected connection: {e}")
+                continue
+            threading.Thread(target=_handle, args=(conn, handlers, locks), daemon=True).start()
+    except KeyboardInterrupt:
+        print("\n🛑 Model server stopped.")
+    finally:
+        listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dhikra model server")
+    parser.add_argument("--socket", default=os.getenv("DHIKRA_MODEL_SOCKET", "/tmp/dhikra-model.sock"))
+    parser.add_argument("--models", default="transcribe,match",
+                        help=f"Comma-separated subset of {', '.join(AVAILABLE_MODELS)}")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("DHIKRA_MODEL_THREADS", "0")) or None,
+                        help="intra-op threads for this process's models (default: host tuning profile, else 1)")
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    unknown = set(models) - set(AVAILABLE_MODELS)
+    if unknown:
+        parser.error(f"Unknown models: {', '.join(sorted(unknown))}")
+
+    serve(args.socket, models, args.threads)
+
+
+if __name__ == "__main__":
+    main()
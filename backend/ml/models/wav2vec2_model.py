@@ -1,9 +1,14 @@
 from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
 
+SAMPLE_RATE = 16000
+
 class ArabicWav2Vec2:
     def __init__(self):
         self.processor = Wav2Vec2Processor.from_pretrained("jonatasgrosman/wav2vec2-large-xlsr-53-arabic")
         self.model = Wav2Vec2ForCTC.from_pretrained("jonatasgrosman/wav2vec2-large-xlsr-53-arabic")
+        self.model.eval()
+        # Audio samples per output frame (320 → 20 ms frames)
+        self.samples_per_frame = getattr(self.model.config, "inputs_to_logits_ratio", 320)
 
     def transcribe(self, audio_path):
         import librosa, torch
@@ -18,3 +23,47 @@ class ArabicWav2Vec2:
         transcription = self.processor.batch_decode(predicted_ids)[0]
 
         return transcription
+
+    def frame_log_probs(self, audio_path, window_s=30.0, overlap_s=2.0):
+        """
+        Frame-level CTC log-probabilities for a whole recording.
+
+        The audio is processed in overlapping windows so memory stays bounded
+        however long the recording is; each window contributes the frames away
+        from its edges, where the model has context on both sides.
+
+        Args:
+            audio_path (str): Path to the recording.
+            window_s (float): Window length in seconds.
+            overlap_s (float): Overlap between consecutive windows in seconds.
+
+        Returns:
+            np.ndarray: (frames, vocab) float32 log-probabilities.
+        """
+        import librosa, numpy as np, torch
+
+        speech, _ = librosa.load(audio_path, sr=SAMPLE_RATE)
+
+        spf = self.samples_per_frame
+        window_f = max(int(window_s * SAMPLE_RATE) // spf, 1)
+        margin_f = min(int(overlap_s * SAMPLE_RATE) // spf // 2, window_f // 4)
+        stride_f = window_f - 2 * margin_f
+        total_f = len(speech) // spf
+
+        chunks = []
+        start_f = 0
+        while True:
+            segment = speech[start_f * spf:(start_f + window_f) * spf]
+            input_values = self.processor(segment, return_tensors="pt", sampling_rate=SAMPLE_RATE).input_values
+            with torch.no_grad():
+                log_probs = torch.log_softmax(self.model(input_values).logits[0], dim=-1).numpy()
+
+            is_last = start_f + window_f >= total_f
+            keep_from = margin_f if start_f else 0
+            keep_to = len(log_probs) if is_last else margin_f + stride_f
+            chunks.append(log_probs[keep_from:keep_to])
+            if is_last:
+                break
+            start_f += stride_f
+
+        return np.concatenate(chunks).astype(np.float32)
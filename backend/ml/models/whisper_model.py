@@ -1,9 +1,94 @@
+import re
+import unicodedata
+
 import whisper 
+from whisper.decoding import DecodingOptions, DecodingTask, LogitFilter
+
+
+def _words(text):
+    # Fold transliteration diacritics ("Allāh" -> "allah") so they don't split words.
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+class ExpectedTextFilter(LogitFilter):
+    """
+    Force end-of-text once the output has finished the expected text, or has
+    clearly wandered away from it, so decoding stops early either way.
+    """
+
+    def __init__(self, tokenizer, expected_text, sample_begin, min_words=6, max_miss_ratio=0.6):
+        self.tokenizer = tokenizer
+        self.sample_begin = sample_begin
+        self.expected_vocab = set(_words(expected_text))
+        self.expected_tail = _words(expected_text)[-3:]
+        self.min_words = min_words
+        self.max_miss_ratio = max_miss_ratio
+
+    def _should_stop(self, words):
+        tail = self.expected_tail
+        if tail and words[-len(tail):] == tail:
+            return True
+        if len(words) >= self.min_words:
+            missed = sum(w not in self.expected_vocab for w in words)
+            return missed / len(words) > self.max_miss_ratio
+        return False
+
+    def apply(self, logits, tokens):
+        eot = self.tokenizer.eot
+        for i in range(tokens.shape[0]):
+            generated = [t for t in tokens[i, self.sample_begin:].tolist() if t < eot]
+            if self._should_stop(_words(self.tokenizer.decode(generated))):
+                logits[i, :] = -float("inf")
+                logits[i, eot] = 0
+
 
 class WhisperModel:
     def __init__(self, model_name="base"):
+        self.model_name = model_name
         self.model = whisper.load_model(model_name)
 
-    def transcribe(self, audio_path):
-        result = self.model.transcribe(audio_path, language="ar")
+    def transcribe(self, audio_path, **options):
+        options.setdefault("language", "ar")
+        result = self.model.transcribe(audio_path, **options)
         return result["text"], result["segments"]
+
+    def transcribe_expected(self, audio_path, expected_text, task="translate", language="ar"):
+        """
+        Decode a short clip (up to 30 s) when the recited text is known in advance.
+
+        The expected text is the prompt, decoding is greedy, the sample length
+        is capped from the expected text's token count, and decoding stops once
+        the output completes or diverges from the expected text.
+
+        Args:
+            audio_path (str): Path to the clip.
+            expected_text (str): Text the clip should contain, in the output language.
+
+        Returns:
+            tuple[str, float, float]: (text, avg_logprob, no_speech_prob)
+        """
+        audio = whisper.pad_or_trim(whisper.load_audio(audio_path))
+        mel = whisper.log_mel_spectrogram(audio, self.model.dims.n_mels).to(self.model.device)
+
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            self.model.is_multilingual, num_languages=self.model.num_languages, language=language, task=task
+        )
+        expected_tokens = len(tokenizer.encode(" " + expected_text.strip()))
+        sample_len = min(int(expected_tokens * 1.5) + 8, self.model.dims.n_text_ctx // 2)
+
+        options = DecodingOptions(
+            task=task,
+            language=language,
+            prompt=expected_text,
+            sample_len=sample_len,
+            temperature=0.0,
+            without_timestamps=True,
+            fp16=self.model.device.type != "cpu",
+        )
+        decoding = DecodingTask(self.model, options)
+        decoding.logit_filters.append(
+            ExpectedTextFilter(decoding.tokenizer, expected_text, decoding.sample_begin)
+        )
+        result = decoding.run(mel.unsqueeze(0))[0]
+        return result.text, result.avg_logprob, result.no_speech_prob
@@ -0,0 +1,83 @@
+"""
+Torch-free runtime for the exported sentence encoder.
+
+Reproduces SentenceTransformer("all-MiniLM-L6-v2").encode (mean pooling over
+the attention mask, then L2 normalisation) with onnxruntime and the Rust
+`tokenizers` package. Export the model with scripts/export_onnx_encoder.py.
+"""
+import os
+
+import numpy as np
+
+ONNX_ENCODER_DIR = "data/onnx_encoder"
+MAX_SEQ_LENGTH = 256  # matches all-MiniLM-L6-v2's max_seq_length
+
+
+def onnx_encoder_available(model_dir=ONNX_ENCODER_DIR):
+    return os.path.exists(os.path.join(model_dir, "tokenizer.json")) and bool(_model_file(model_dir))
+
+
+def _model_file(model_dir):
+    # Prefer the quantized model when both were exported
+    for name in ("model.int8.onnx", "model.onnx"):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class OnnxSentenceEncoder:
+    def __init__(self, model_dir=ONNX_ENCODER_DIR, model_file=None, threads=None):
+        """
+        Args:
+            model_dir (str): Directory with tokenizer.json and model(.int8).onnx.
+            model_file (str): Explicit .onnx file; defaults to the int8 model if present.
+            threads (int): onnxruntime intra-op threads (defaults to the runtime's choice).
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        self.threads = threads
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.model_file = model_file or _model_file(model_dir)
+        self.session = ort.InferenceSession(
+            self.model_file, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """
+        Embed sentences.
+
+        Args:
+            sentences (list[str]): Texts to encode.
+            batch_size (int): Sentences per forward pass.
+
+        Returns:
+            np.ndarray: (len(sentences), dim) float32 unit vectors.
+        """
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(sentences[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append(pooled / np.clip(norms, 1e-12, None))
+
+        if not batches:
+            return np.zeros((0, self.session.get_outputs()[0].shape[-1]), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32)
@@ -0,0 +1,94 @@
+"""
+Per-user fair scheduling for inference.
+
+Jobs are queued per user and workers take them round-robin across users, so
+one client looping on uploads only delays its own requests instead of
+everyone queued behind it.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+INFERENCE_WORKERS = int(os.getenv("DHIKRA_INFERENCE_WORKERS", "1"))
+MAX_PENDING_PER_USER = int(os.getenv("DHIKRA_MAX_PENDING_PER_USER", "4"))
+# Full-surah alignments run for minutes, so they get their own workers
+# rather than holding up short transcriptions.
+ALIGN_WORKERS = int(os.getenv("DHIKRA_ALIGN_WORKERS", "1"))
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a user already has the maximum number of jobs queued."""
+
+
+class FairScheduler:
+    def __init__(self, workers: int = 1, max_pending_per_user: int = 4):
+        """
+        Args:
+            workers (int): Jobs run concurrently (one per loaded model, usually).
+            max_pending_per_user (int): Queue cap per user; 0 for unbounded.
+        """
+        self.workers = workers
+        self.max_pending_per_user = max_pending_per_user
+        self._queues = OrderedDict()  # user -> deque of jobs, in round-robin order
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, user, fn, *args, **kwargs) -> Future:
+        """
+        Queue `fn(*args, **kwargs)` on behalf of `user`.
+
+        Returns:
+            Future: Resolves with the job's result or exception.
+
+        Raises:
+            QueueFullError: If the user already has too many pending jobs.
+        """
+        future = Future()
+        with self._cond:
+            queue = self._queues.get(user)
+            if queue is None:
+                queue = self._queues[user] = deque()
+            if self.max_pending_per_user and len(queue) >= self.max_pending_per_user:
+                raise QueueFullError(f"{len(queue)} jobs already pending")
+            queue.append((future, fn, args, kwargs))
+            self._start_workers()
+            self._cond.notify()
+        return future
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self):
+        """Pop the head job of the next user and rotate them to the back."""
+        user, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        del self._queues[user]
+        if queue:
+            self._queues[user] = queue
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                future, fn, args, kwargs = self._next_job()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+inference_scheduler = FairScheduler(INFERENCE_WORKERS, MAX_PENDING_PER_USER)
+alignment_scheduler = FairScheduler(ALIGN_WORKERS, max_pending_per_user=1)
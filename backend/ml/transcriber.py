@@ -1,17 +1,197 @@
-import whisper
-import warnings
-warnings.filterwarnings("ignore", category=UserWarning, message="FP16 is not supported on CPU; using FP32 instead")
 import os
+import threading
 import warnings
 
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
 warnings.filterwarnings("ignore", category=UserWarning, message="FP16 is not supported on CPU; using FP32 instead")
 
-import whisper
+from ml import model_client
+
+WHISPER_MODEL = os.getenv("DHIKRA_WHISPER_MODEL", "medium")  # use "medium" or "large" for better accuracy
+
+# Cheap first tier; clips it is unsure about are re-run on WHISPER_MODEL.
+# Set to an empty string to always use WHISPER_MODEL.
+FAST_WHISPER_MODEL = os.getenv("DHIKRA_FAST_WHISPER_MODEL", "base")
+LOGPROB_THRESHOLD = float(os.getenv("DHIKRA_CASCADE_LOGPROB_THRESHOLD", "-0.6"))
+NO_SPEECH_THRESHOLD = float(os.getenv("DHIKRA_CASCADE_NO_SPEECH_THRESHOLD", "0.6"))
+MATCH_THRESHOLD = float(os.getenv("DHIKRA_CASCADE_MATCH_THRESHOLD", "0.55"))
+
+# Whether the ayah-match gate may load the sentence encoder in this process.
+# Model servers clear it unless they also serve "match", and use a match
+# server from DHIKRA_MODEL_SOCKETS instead.
+LOCAL_MATCH = True
+
+_models = {}
+_models_lock = threading.Lock()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_model(name=WHISPER_MODEL):
+    """Load a Whisper tier once per process, on first use."""
+    with _models_lock:
+        if name not in _models:
+            from ml.models.whisper_model import WhisperModel
+            _models[name] = WhisperModel(name)
+        return _models[name]
+
+
+def cascade_enabled():
+    return bool(FAST_WHISPER_MODEL) and FAST_WHISPER_MODEL != WHISPER_MODEL
+
+
+def load_models():
+    """Load every configured tier up front (used by the model server)."""
+    if cascade_enabled():
+        get_model(FAST_WHISPER_MODEL)
+    get_model(WHISPER_MODEL)
+
+
+def segment_confidence(segments):
+    """
+    Token-weighted average log-probability and no-speech probability.
+
+    Args:
+        segments (list[dict]): Whisper result segments.
+
+    Returns:
+        tuple[float, float]: (avg_logprob, no_speech_prob)
+    """
+    weights = [max(len(s.get("tokens", [])), 1) for s in segments]
+    total = sum(weights)
+    if not total:
+        return float("-inf"), 1.0
+    avg_logprob = sum(s["avg_logprob"] * w for s, w in zip(segments, weights)) / total
+    no_speech_prob = sum(s["no_speech_prob"] * w for s, w in zip(segments, weights)) / total
+    return avg_logprob, no_speech_prob
+
+
+def _match_similarity(text):
+    """Best ayah similarity for the match gate, or None if no matcher is available here."""
+    if LOCAL_MATCH:
+        from ml.ayah_matcher import match_ayah_local
+        return match_ayah_local(text)["similarity_score"]
+    if model_client.provides("match"):
+        return model_client.call("match", text)["similarity_score"]
+    return None
+
+
+def is_silent(avg_logprob, no_speech_prob):
+    """Whisper thinks the clip is empty and did not confidently decode anything."""
+    return no_speech_prob >= NO_SPEECH_THRESHOLD and avg_logprob < LOGPROB_THRESHOLD
+
+
+def is_confident(text, avg_logprob, no_speech_prob):
+    """
+    Decide whether a fast-tier transcript can be returned as-is.
+
+    A clip is accepted if Whisper is confident it heard nothing, or if it is
+    confident in its tokens and the text matches an ayah well. The match
+    check is skipped when no matcher is reachable from this process.
+    """
+    if is_silent(avg_logprob, no_speech_prob):
+        return True
+    if avg_logprob < LOGPROB_THRESHOLD or not text.strip():
+        return False
+
+    similarity = _match_similarity(text)
+    return similarity is None or similarity >= MATCH_THRESHOLD
+
+
+def _record(tier, resolved):
+    with _stats_lock:
+        counts = _stats.setdefault(tier, {"requests": 0, "resolved": 0})
+        counts["requests"] += 1
+        counts["resolved"] += int(resolved)
+
+
+def transcribe_local(filepath):
+    if cascade_enabled():
+        text, segments = get_model(FAST_WHISPER_MODEL).transcribe(filepath, task="translate")
+        if is_confident(text, *segment_confidence(segments)):
+            _record(FAST_WHISPER_MODEL, True)
+            return text
+        _record(FAST_WHISPER_MODEL, False)
+
+    text, _ = get_model(WHISPER_MODEL).transcribe(filepath, task="translate")
+    _record(WHISPER_MODEL, True)
+    return text
+
+
+def transcribe_expected_local(filepath, expected_text):
+    """
+    Session-aware decode: prompt with the expected ayah translation, decode
+    greedily with a capped length, and stop once the text completes or
+    diverges. Follows the same fast-tier-first cascade as transcribe_local,
+    including the ayah-match check: the prompt makes Whisper confident in
+    text that merely echoes it, so log-probability alone is not enough.
+    """
+    if cascade_enabled():
+        text, avg_logprob, no_speech_prob = get_model(FAST_WHISPER_MODEL).transcribe_expected(filepath, expected_text)
+        if is_confident(text, avg_logprob, no_speech_prob):
+            _record(FAST_WHISPER_MODEL, True)
+            return text
+        _record(FAST_WHISPER_MODEL, False)
+
+    text, _, _ = get_model(WHISPER_MODEL).transcribe_expected(filepath, expected_text)
+    _record(WHISPER_MODEL, True)
+    return text
+
+
+def transcription_stats_local():
+    with _stats_lock:
+        return {tier: dict(counts) for tier, counts in _stats.items()}
+
+
+def reset_transcription_stats():
+    """Forget tier counts, e.g. after benchmark or warm-up runs."""
+    with _stats_lock:
+        _stats.clear()
+
+
+def transcription_stats():
+    """
+    Per-tier request counts and escalation rates.
+
+    Returns:
+        dict: tier -> {"requests", "resolved", "escalation_rate"}, summed over
+        all model servers when inference is delegated.
+    """
+    if model_client.enabled():
+        per_server = model_client.call_all("transcription_stats")
+    else:
+        per_server = [transcription_stats_local()]
+
+    totals = {}
+    for stats in per_server:
+        for tier, counts in stats.items():
+            tier_totals = totals.setdefault(tier, {"requests": 0, "resolved": 0})
+            tier_totals["requests"] += counts["requests"]
+            tier_totals["resolved"] += counts["resolved"]
+
+    for counts in totals.values():
+        requests = counts["requests"]
+        counts["escalation_rate"] = (requests - counts["resolved"]) / requests if requests else 0.0
+    return totals
+
+
+def transcribe_audio(filepath, expected_text=None):
+    """
+    Translate a recitation clip to English.
+
+    Args:
+        filepath (str): Path to the audio file.
+        expected_text (str): Translation of the ayah the reciter should be on,
+            if known (e.g. mid-session); enables the faster conditioned decode.
 
-# Load Whisper model once
-model = whisper.load_model("medium")  # use "medium" or "large" for better accuracy
+    Returns:
+        str: Transcribed (translated) text.
+    """
+    if expected_text:
+        if model_client.enabled():
+            return model_client.call("transcribe_expected", filepath, expected_text)
+        return transcribe_expected_local(filepath, expected_text)
 
-def transcribe_audio(filepath):
-    result = model.transcribe(filepath, task="translate", language="ar")
-    return result["text"]
+    if model_client.enabled():
+        return model_client.call("transcribe", filepath)
+    return transcribe_local(filepath)
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+
+from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from auth import verify_firebase_token
+
+# Shared store for multi-worker deployments; per-process buckets if unset
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+class InMemoryBackend:
+    """Token buckets held in this process."""
+
+    MAX_KEYS = 10000
+    blocking = False  # cheap enough to call on the event loop
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, last_refill, rate, capacity)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: int) -> float:
+        """
+        Take one token from the bucket for `key`.
+
+        Args:
+            key (str): Bucket identifier (user + endpoint).
+            rate (float): Tokens refilled per second.
+            capacity (int): Bucket size, i.e. the allowed burst.
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (capacity, now))[:2]
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, rate, capacity)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # A bucket that would have refilled completely carries no state.
+        # Each bucket is judged by its own endpoint's limits.
+        idle = [
+            k for k, (tokens, last, rate, capacity) in self._buckets.items()
+            if tokens + (now - last) * rate >= capacity
+        ]
+        for k in idle:
+            del self._buckets[k]
+
+
+class RedisBackend:
+    """Token buckets shared by every API worker through Redis."""
+
+    # Refill and take atomically; returns the wait in milliseconds
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return math.ceil(wait * 1000)
+    """
+
+    blocking = True  # network round-trip; run off the event loop
+    TIMEOUT = 0.5  # seconds; a slow Redis should not hold requests up
+
+    def __init__(self, url: str):
+        import redis
+        self._errors = redis.RedisError
+        self._redis = redis.Redis.from_url(url, socket_timeout=self.TIMEOUT, socket_connect_timeout=self.TIMEOUT)
+        self._script = self._redis.register_script(self.SCRIPT)
+        # Fail open to per-process limits while Redis is unreachable, so an
+        # outage neither 500s every limited endpoint nor removes the limits.
+        self._fallback = InMemoryBackend()
+        self._failing = False
+
+    def take(self, key: str, rate: float, capacity: int) -> float:
+        try:
+            wait_ms = self._script(keys=[f"dhikra:ratelimit:{key}"], args=[rate, capacity, time.time()])
+        except self._errors as e:
+            if not self._failing:
+                print(f"Warning: Redis rate limiting unavailable, using in-process limits: {e}")
+                self._failing = True
+            return self._fallback.take(key, rate, capacity)
+        if self._failing:
+            print("Redis rate limiting restored")
+            self._failing = False
+        return wait_ms / 1000.0
+
+
+def _create_backend():
+    if REDIS_URL:
+        try:
+            return RedisBackend(REDIS_URL)
+        except ImportError:
+            print("Warning: REDIS_URL is set but redis is not installed; using in-process rate limits")
+    return InMemoryBackend()
+
+
+backend = _create_backend()
+
+
+def rate_limit(endpoint: str, per_minute: float, burst: int):
+    """
+    Build a dependency enforcing a per-user token bucket on an endpoint.
+
+    Limits can be overridden with DHIKRA_RATE_LIMIT_<ENDPOINT>=<per_minute>/<burst>,
+    e.g. DHIKRA_RATE_LIMIT_TRANSCRIBE=12/4.
+
+    Args:
+        endpoint (str): Name used in the bucket key and the env override.
+        per_minute (float): Sustained requests per minute.
+        burst (int): Requests allowed back-to-back.
+
+    Returns:
+        Callable: FastAPI dependency returning the caller's Firebase UID.
+    """
+    override = os.getenv(f"DHIKRA_RATE_LIMIT_{endpoint.upper()}")
+    if override:
+        per_minute, burst = override.split("/")
+        per_minute, burst = float(per_minute), int(burst)
+    rate = per_minute / 60.0
+
+    async def dependency(firebase_uid: str = Depends(verify_firebase_token)) -> str:
+        key = f"{endpoint}:{firebase_uid}"
+        if backend.blocking:
+            wait = await run_in_threadpool(backend.take, key, rate, burst)
+        else:
+            wait = backend.take(key, rate, burst)
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down",
+                headers={"Retry-After": str(max(1, int(wait + 0.999)))}
+            )
+        return firebase_uid
+
+    return dependency
@@ -0,0 +1,101 @@
+"""
+Retention job for the monthly transcription_logs partitions.
+
+Detaches partitions older than the retention window, archives each to a
+gzip'd CSV (COPY output), then drops it. Also creates upcoming partitions, so
+run it at least monthly (e.g. from cron):
+
+    python -m scripts.archive_logs --retain-months 6 --archive-dir archive/
+"""
+import argparse
+import gzip
+import os
+import re
+import shutil
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import engine, ensure_log_partitions, lock_schema, month_start
+
+# Monthly partitions only; transcription_logs_default is never archived.
+PARTITION_PATTERN = re.compile(r"^transcription_logs_y(\d{4})m(\d{2})$")
+
+
+def list_partitions(conn):
+    """
+    Monthly partition tables, including ones a crashed run left detached.
+
+    Returns:
+        list[tuple[str, date, bool]]: (table name, month, still attached)
+    """
+    rows = conn.execute(text("""
+        SELECT c.relname, i.inhparent IS NOT NULL
+        FROM pg_class c
+        LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+        WHERE c.relkind = 'r' AND c.relname LIKE 'transcription_logs_y%'
+    """)).all()
+    partitions = []
+    for name, attached in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1), attached))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def archive_partition(name, archive_dir):
+    """COPY a detached partition to <archive_dir>/<name>.csv.gz."""
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    partial = path + ".partial"
+    raw = engine.raw_connection()
+    try:
+        with gzip.open(partial, "wb") as f:
+            raw.cursor().copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+    finally:
+        raw.close()
+    shutil.move(partial, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive and drop old transcription_logs partitions")
+    parser.add_argument("--retain-months", type=int, default=6,
+                        help="Months kept online, including the current one")
+    parser.add_argument("--archive-dir", default="archive")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    cutoff = month_start(datetime.utcnow().date(), -(args.retain_months - 1))
+
+    with engine.begin() as conn:
+        if not args.dry_run:
+            lock_schema(conn)
+            ensure_log_partitions(conn)
+        expired = [p for p in list_partitions(conn) if p[1] < cutoff]
+
+    if not expired:
+        print(f"Nothing older than {cutoff.isoformat()} to archive.")
+        return
+
+    os.makedirs(args.archive_dir, exist_ok=True)
+    for name, month, attached in expired:
+        if args.dry_run:
+            print(f"Would archive {name} ({month:%Y-%m})")
+            continue
+
+        if attached:
+            # Detached first so queries and inserts stop touching it
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE transcription_logs DETACH PARTITION {name}"))
+
+        path = archive_partition(name, args.archive_dir)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {name}"))
+        print(f"✅ Archived {name} to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 import numpy as np
+import os
 import pickle
-from sentence_transformers import SentenceTransformer
+import sys
 from sklearn.metrics.pairwise import cosine_similarity
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.onnx_encoder import OnnxSentenceEncoder, onnx_encoder_available
+
 # Paths
 EMBEDDINGS_PATH = "data/embeddings.npy"
 METADATA_PATH = "data/ayah_metadata.pkl"
+SPAN_EMBEDDINGS_PATH = "data/span_embeddings.npy"
+SPAN_METADATA_PATH = "data/span_metadata.pkl"
 
 # Load once
 #print("Loading embeddings...")
@@ -13,8 +20,57 @@ embeddings = np.load(EMBEDDINGS_PATH)
 with open(METADATA_PATH, "rb") as f:
     metadata = pickle.load(f)
 
+# Whole ayahs plus (if generated) sub-ayah windows and adjacent-ayah pairs,
+# searched together. Each row of index_embeddings has a location in `locations`.
+locations = [
+    {"surah": m["surah"], "ayah": m["ayah"], "end_ayah": m["ayah"], "word_offset": 0, "kind": "ayah"}
+    for m in metadata
+]
+index_embeddings = embeddings
+if os.path.exists(SPAN_EMBEDDINGS_PATH) and os.path.exists(SPAN_METADATA_PATH):
+    with open(SPAN_METADATA_PATH, "rb") as f:
+        locations += pickle.load(f)
+    index_embeddings = np.vstack([embeddings, np.load(SPAN_EMBEDDINGS_PATH)])
+
+ayah_rows = {(m["surah"], m["ayah"]): i for i, m in enumerate(metadata)}
+surah_rows = {}
+for i, loc in enumerate(locations):
+    surah_rows.setdefault(loc["surah"], []).append(i)
+surah_rows = {surah: np.array(rows) for surah, rows in surah_rows.items()}
+
 #print("Embeddings + metadata loaded.")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+
+# Use the exported ONNX encoder when present (no torch import); set
+# DHIKRA_ENCODER=torch to force the PyTorch model. onnxruntime keeps its own
+# thread pool, so torch's thread settings don't reach it.
+ENCODER_THREADS = int(os.getenv("DHIKRA_ENCODER_THREADS", "0")) or None
+if os.getenv("DHIKRA_ENCODER", "auto") != "torch" and onnx_encoder_available():
+    model = OnnxSentenceEncoder(threads=ENCODER_THREADS)
+else:
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+
+
+def set_encoder_threads(threads):
+    """
+    Limit the ONNX encoder to `threads` intra-op threads. The PyTorch encoder
+    follows torch.set_num_threads instead.
+    """
+    global model
+    if isinstance(model, OnnxSentenceEncoder) and model.threads != threads:
+        model = OnnxSentenceEncoder(model_file=model.model_file, threads=threads)
+
+
+def get_ayah(surah, ayah):
+    """
+    Look up an ayah's metadata.
+
+    Returns:
+        dict or None: surah, ayah, arabic_text and english_text, or None if
+        the surah has no such ayah.
+    """
+    row = ayah_rows.get((surah, ayah))
+    return metadata[row] if row is not None else None
 
 
 def find_most_similar_ayah(transcript, top_k=3, surah_filter=None):
@@ -27,29 +83,42 @@ def find_most_similar_ayah(transcript, top_k=3, surah_filter=None):
         surah_filter (int or None): If set, restricts matching to a specific surah
 
     Returns:
-        List[dict]: Top-k ayahs with similarity scores
+        List[dict]: Top-k ayahs with similarity scores. Each also carries the
+        best-matching location: match_kind ("ayah", "window" or "pair"),
+        word_offset into the ayah's translation, and end_ayah (the next ayah
+        for a cross-boundary pair, otherwise the same ayah).
     """
 
     if surah_filter is not None:
-        metadata_filtered = [m for m in metadata if m["surah"] == surah_filter]
-        embedding_subset = [embeddings[i] for i, m in enumerate(metadata) if m["surah"] == surah_filter]
+        rows = surah_rows.get(surah_filter)
+        if rows is None:
+            print(f"No ayahs found for Surah {surah_filter}")
+            return []
+        embedding_subset = index_embeddings[rows]
     else:
-        metadata_filtered = metadata
-        embedding_subset = embeddings
-
-    if len(embedding_subset) == 0:
-        print(f"No ayahs found for Surah {surah_filter}")
-        return []
+        rows = None
+        embedding_subset = index_embeddings
 
     query_embedding = model.encode([transcript])[0]
     scores = cosine_similarity([query_embedding], embedding_subset)[0]
 
-    top_indices = np.argsort(scores)[::-1][:top_k]
+    # Keep the best-scoring location of each ayah
     results = []
+    seen = set()
+    for i in np.argsort(scores)[::-1]:
+        loc = locations[i if rows is None else rows[i]]
+        key = (loc["surah"], loc["ayah"])
+        if key in seen:
+            continue
+        seen.add(key)
 
-    for i in top_indices:
-        match = metadata_filtered[i].copy()
+        match = metadata[ayah_rows[key]].copy()
         match["similarity"] = scores[i]
+        match["end_ayah"] = loc["end_ayah"]
+        match["word_offset"] = loc["word_offset"]
+        match["match_kind"] = loc["kind"]
         results.append(match)
+        if len(results) == top_k:
+            break
 
     return results
@@ -0,0 +1,234 @@
+"""
+Grade a batch of recitation recordings offline.
+
+Walks a directory (or reads a manifest of paths), shards the files across a
+process pool whose workers each load the models once, and streams one JSON
+line per recording to the output file. Files already graded in the output are
+skipped, so an interrupted run resumes where it stopped.
+
+    python -m scripts.bulk_grade recordings/ --output grades.jsonl --workers 4
+    python -m scripts.bulk_grade manifest.csv --output grades.jsonl --db-user <firebase_uid>
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm"}
+SAMPLE_RATE = 16000
+MIN_CHUNK_SECONDS = 0.5
+
+
+def iter_inputs(source):
+    """
+    Audio paths from a directory, a CSV manifest (with a `path` column) or a
+    text manifest (one path per line).
+    """
+    if os.path.isdir(source):
+        for root, _, files in sorted(os.walk(source)):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    yield os.path.join(root, name)
+    elif source.endswith(".csv"):
+        with open(source, newline="") as f:
+            for row in csv.DictReader(f):
+                yield row["path"]
+    else:
+        with open(source) as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    yield line.strip()
+
+
+def load_completed(output_path):
+    """Paths already graded successfully in a previous run."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from a crash
+            if "error" not in record:
+                done.add(record["path"])
+    return done
+
+
+def _init_worker(threads):
+    """Load the models once per worker process."""
+    from ml import autotune, model_client, transcriber
+
+    if not model_client.enabled():
+        models = ["transcribe", "match"]
+        autotune.configure_runtime(models)
+        transcriber.load_models()
+        import scripts.ayah_matcher  # noqa: F401  (loads encoder + embeddings)
+        autotune.apply_threads(models, threads)
+
+
+def split_audio(path, chunk_seconds):
+    """Write the recording as consecutive chunk WAVs, like a live session records them."""
+    import librosa
+    import soundfile as sf
+
+    audio, _ = librosa.load(path, sr=SAMPLE_RATE)
+    step = int(chunk_seconds * SAMPLE_RATE)
+    for start in range(0, len(audio), step):
+        chunk = audio[start:start + step]
+        if len(chunk) < MIN_CHUNK_SECONDS * SAMPLE_RATE:
+            break
+        temp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        temp.close()
+        sf.write(temp.name, chunk, SAMPLE_RATE)
+        yield temp.name
+
+
+def grade_file(path, chunk_seconds=7, top_k=3):
+    """
+    Grade one recording as a hifz session over fixed-length chunks.
+
+    Returns:
+        dict: path, transcript, chunks (per-chunk transcript, top-k ayahs and
+        tracker status), the tracker's surah and history, and timings in seconds.
+    """
+    from hifz.session_manager import SessionManager
+    from ml.transcriber import transcribe_audio
+
+    started = time.perf_counter()
+    timings = {"transcribe": 0.0, "match": 0.0}
+    session = SessionManager()
+    chunks = []
+
+    for chunk_path in split_audio(path, chunk_seconds):
+        try:
+            t0 = time.perf_counter()
+            transcript = transcribe_audio(chunk_path, expected_text=session.expected_text())
+            t1 = time.perf_counter()
+            result = session.process_transcript(transcript, top_k=top_k, verbose=False)
+            t2 = time.perf_counter()
+        finally:
+            os.unlink(chunk_path)
+
+        timings["transcribe"] += t1 - t0
+        timings["match"] += t2 - t1
+        chunks.append({
+            "transcript": transcript,
+            "status": result["status"],
+            "ayahs": [{"ayah": int(a), "status": s} for a, s in result["ayahs"]],
+            "matches": [
+                {
+                    "surah": int(m["surah"]),
+                    "ayah": int(m["ayah"]),
+                    "similarity": round(float(m["similarity"]), 4),
+                    "match_kind": m.get("match_kind", "ayah"),
+                    "end_ayah": int(m.get("end_ayah", m["ayah"])),
+                }
+                for m in result["matches"]
+            ],
+        })
+
+    timings["total"] = time.perf_counter() - started
+    return {
+        "path": path,
+        "transcript": " ".join(c["transcript"].strip() for c in chunks),
+        "surah": session.surah,
+        "history": [[int(a), s] for a, s in session.tracker.history] if session.tracker else [],
+        "chunks": chunks,
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+    }
+
+
+def insert_logs(firebase_uid, records):
+    """Bulk-insert one transcription_logs row per matched chunk."""
+    from sqlalchemy import insert
+    from database import SessionLocal, TranscriptionLog, get_or_create_user
+
+    db = SessionLocal()
+    try:
+        user = get_or_create_user(db, firebase_uid)
+        rows = [
+            {
+                "user_id": user.id,
+                "transcription_text": chunk["transcript"],
+                "matched_ayah": f"{chunk['matches'][0]['surah']}:{chunk['matches'][0]['ayah']}" if chunk["matches"] else None,
+                "similarity_score": chunk["matches"][0]["similarity"] if chunk["matches"] else None,
+            }
+            for record in records if "error" not in record
+            for chunk in record["chunks"] if chunk["transcript"].strip()
+        ]
+        if rows:
+            db.execute(insert(TranscriptionLog), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade recitation recordings offline")
+    parser.add_argument("source", help="Directory of recordings, or a .csv/.txt manifest of paths")
+    parser.add_argument("--output", default="grades.jsonl", help="JSONL results; also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) // 2, 1))
+    parser.add_argument("--threads-per-worker", type=int, default=2)
+    parser.add_argument("--chunk-seconds", type=float, default=7)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--db-user", help="Firebase UID to record results under in transcription_logs")
+    parser.add_argument("--db-batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    completed = load_completed(args.output)
+    pending = [p for p in dict.fromkeys(iter_inputs(args.source)) if p not in completed]
+    print(f"📂 {len(pending)} recordings to grade ({len(completed)} already done)", file=sys.stderr)
+    if not pending:
+        return
+
+    # Results reach the checkpoint only after their rows are committed, so a
+    # resumed run never skips a file whose logs were lost.
+    batch_size = args.db_batch_size if args.db_user else 1
+    buffer = []
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        def flush():
+            if args.db_user:
+                insert_logs(args.db_user, buffer)
+            for record in buffer:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            buffer.clear()
+
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=_init_worker,
+            initargs=(args.threads_per_worker,)
+        ) as pool:
+            futures = {
+                pool.submit(grade_file, path, args.chunk_seconds, args.top_k): path
+                for path in pending
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    buffer.append(future.result())
+                except Exception as e:
+                    buffer.append({"path": path, "error": f"{type(e).__name__}: {e}"})
+                    print(f"❌ {path}: {e}", file=sys.stderr)
+                if len(buffer) >= batch_size:
+                    flush()
+                print(f"✅ {done}/{len(pending)} {path}", file=sys.stderr)
+
+        if buffer:
+            flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Export the ayah-matching sentence encoder to ONNX (optionally int8) and check
+that its embeddings stay within a cosine tolerance of the PyTorch model.
+
+    python -m scripts.export_onnx_encoder --quantize
+    python -m scripts.export_onnx_encoder --check-only
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.onnx_encoder import ONNX_ENCODER_DIR, OnnxSentenceEncoder
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+DATASET_PATH = "data/ayah_dataset.csv"
+
+
+def export(output_dir, quantize):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(MODEL_NAME, device="cpu")
+    transformer = model[0].auto_model.eval()
+    model.tokenizer.save_pretrained(output_dir)
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Return only last_hidden_state; pooling happens at runtime."""
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.inner(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            )[0]
+
+    dummy = model.tokenizer(["In the name of Allah"], return_tensors="pt")
+    onnx_path = os.path.join(output_dir, "model.onnx")
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        TokenEmbeddings(transformer),
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        onnx_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["token_embeddings"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes, "token_embeddings": axes},
+        opset_version=14,
+    )
+    print(f"Saved ONNX encoder to {onnx_path}")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(output_dir, "model.int8.onnx")
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"Saved int8 ONNX encoder to {int8_path}")
+
+
+def check_parity(output_dir, tolerance, sample_size):
+    """
+    Compare ONNX and PyTorch embeddings on ayah translations.
+
+    Returns:
+        bool: True if every exported model is within `tolerance` cosine of PyTorch.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    texts = pd.read_csv(DATASET_PATH)["english_text"].sample(
+        n=sample_size, random_state=0
+    ).tolist()
+    reference = SentenceTransformer(MODEL_NAME, device="cpu").encode(texts, normalize_embeddings=True)
+
+    ok = True
+    for name in ("model.onnx", "model.int8.onnx"):
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path):
+            continue
+        embeddings = OnnxSentenceEncoder(output_dir, model_file=path).encode(texts)
+        cosines = np.sum(embeddings * reference, axis=1)
+        passed = cosines.min() >= tolerance
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {name}: min cosine {cosines.min():.5f}, mean {cosines.mean():.5f} (tolerance {tolerance})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sentence encoder to ONNX")
+    parser.add_argument("--output-dir", default=ONNX_ENCODER_DIR)
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8 dynamic-quantized model")
+    parser.add_argument("--check-only", action="store_true", help="Skip export, only run the parity check")
+    parser.add_argument("--tolerance", type=float, default=0.99, help="Minimum cosine vs PyTorch embeddings")
+    parser.add_argument("--sample-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if not args.check_only:
+        export(args.output_dir, args.quantize)
+    if not check_parity(args.output_dir, args.tolerance, args.sample_size):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,98 @@
-import pandas as pd
 import numpy as np
 import os
 import pickle
-from sentence_transformers import SentenceTransformer
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from hifz.quran import clean_translation
 
 # Paths
 DATASET_PATH = "data/ayah_dataset.csv"
 EMBEDDINGS_PATH = "data/embeddings.npy"
 METADATA_PATH = "data/ayah_metadata.pkl"
+SPAN_EMBEDDINGS_PATH = "data/span_embeddings.npy"
+SPAN_METADATA_PATH = "data/span_metadata.pkl"
+
+# Sub-ayah spans, in words of the English translation. A 7-second chunk of
+# recitation translates to roughly WINDOW_WORDS words.
+WINDOW_WORDS = 20
+WINDOW_STRIDE = 10
+
+
+def build_spans(rows):
+    """
+    Build sliding windows over long ayahs and tail/head pairs of adjacent ayahs.
+
+    Args:
+        rows (list[dict]): Ayah records with surah, ayah and english_text.
+
+    Returns:
+        tuple[list[str], list[dict]]: Span texts and their locations, each with
+        surah, ayah (first ayah covered), end_ayah, word_offset (into the first
+        ayah) and kind ("window" or "pair").
+    """
+    texts, spans = [], []
+    half = WINDOW_WORDS // 2
+
+    for i, row in enumerate(rows):
+        words = clean_translation(row["english_text"]).split()
+
+        if len(words) > WINDOW_WORDS:
+            last_start = len(words) - WINDOW_WORDS
+            starts = list(range(0, last_start, WINDOW_STRIDE)) + [last_start]
+            for start in starts:
+                texts.append(" ".join(words[start:start + WINDOW_WORDS]))
+                spans.append({
+                    "surah": row["surah"], "ayah": row["ayah"], "end_ayah": row["ayah"],
+                    "word_offset": start, "kind": "window",
+                })
+
+        nxt = rows[i + 1] if i + 1 < len(rows) else None
+        if nxt is not None and nxt["surah"] == row["surah"]:
+            tail = words[-half:]
+            texts.append(" ".join(tail + clean_translation(nxt["english_text"]).split()[:half]))
+            spans.append({
+                "surah": row["surah"], "ayah": row["ayah"], "end_ayah": nxt["ayah"],
+                "word_offset": len(words) - len(tail), "kind": "pair",
+            })
+
+    return texts, spans
+
+
+if __name__ == "__main__":
+    # Imported here so build_spans can be used without the embedding stack
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+
+    # Load ayah data
+    df = pd.read_csv(DATASET_PATH)
+    texts = df["english_text"].tolist()
+
+    # Load sentence-transformer model
+    print("🔄 Loading embedding model...")
+    model = SentenceTransformer("all-MiniLM-L6-v2")
 
-# Load ayah data
-df = pd.read_csv(DATASET_PATH)
-texts = df["english_text"].tolist()
+    # Generate embeddings
+    print("🔁 Generating embeddings...")
+    embeddings = model.encode(texts, show_progress_bar=True)
 
-# Load sentence-transformer model
-print("🔄 Loading embedding model...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+    # Save embeddings to .npy
+    np.save(EMBEDDINGS_PATH, embeddings)
+    print(f"Saved embeddings to {EMBEDDINGS_PATH}")
 
-# Generate embeddings
-print("🔁 Generating embeddings...")
-embeddings = model.encode(texts, show_progress_bar=True)
+    # Save metadata (so we can map embeddings back to ayahs)
+    metadata = df[["surah", "ayah", "arabic_text", "english_text"]].to_dict(orient="records")
+    with open(METADATA_PATH, "wb") as f:
+        pickle.dump(metadata, f)
+    print(f"Saved metadata to {METADATA_PATH}")
 
-# Save embeddings to .npy
-np.save(EMBEDDINGS_PATH, embeddings)
-print(f"Saved embeddings to {EMBEDDINGS_PATH}")
+    # Span index for partial and cross-boundary recitations
+    print("🔁 Generating span embeddings...")
+    span_texts, spans = build_spans(metadata)
+    span_embeddings = model.encode(span_texts, show_progress_bar=True)
 
-# Save metadata (so we can map embeddings back to ayahs)
-metadata = df[["surah", "ayah", "arabic_text", "english_text"]].to_dict(orient="records")
-with open(METADATA_PATH, "wb") as f:
-    pickle.dump(metadata, f)
-print(f"Saved metadata to {METADATA_PATH}")
+    np.save(SPAN_EMBEDDINGS_PATH, span_embeddings)
+    with open(SPAN_METADATA_PATH, "wb") as f:
+        pickle.dump(spans, f)
+    print(f"Saved {len(spans)} spans to {SPAN_EMBEDDINGS_PATH} and {SPAN_METADATA_PATH}")
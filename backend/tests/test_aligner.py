@@ -0,0 +1,44 @@
+import os
+import sys
+sys.path.append(os.path.abspath("."))
+
+import numpy as np
+
+from ml.aligner import ctc_forced_align, align_ayahs, normalize_arabic
+
+
+def _emissions(frame_tokens, vocab_size, confidence=0.9):
+    """Log-probs where each frame strongly prefers the given token."""
+    probs = np.full((len(frame_tokens), vocab_size), (1 - confidence) / (vocab_size - 1))
+    probs[np.arange(len(frame_tokens)), frame_tokens] = confidence
+    return np.log(probs)
+
+
+def test_ctc_forced_align_same_path_for_any_checkpointing():
+    # blank=0; "1 2 2 3" with a blank separating the repeated 2s
+    frames = [0, 1, 1, 0, 2, 0, 2, 2, 3, 0, 0]
+    log_probs = _emissions(frames, vocab_size=4)
+
+    for checkpoint_every in (None, 1, 2, 4, 100):
+        token_index, _ = ctc_forced_align(log_probs, [1, 2, 2, 3], blank=0, checkpoint_every=checkpoint_every)
+        assert token_index.tolist() == [-1, 0, 0, -1, 1, -1, 2, 2, 3, -1, -1]
+
+
+def test_normalize_arabic_strips_marks_and_maps_spaces():
+    vocab = {"<pad>": 0, "|": 1, **{c: i + 2 for i, c in enumerate("ابسمله")}}
+    assert normalize_arabic("بِسۡمِ ٱللَّهِ", vocab) == list("بسم|الله")
+
+
+def test_align_ayahs_reports_timestamps_per_ayah():
+    vocab = {"<pad>": 0, "|": 1, "ا": 2, "ب": 3}
+    # ayah 1 "ا" in frames 1-2, ayah 2 "ب" in frames 5-6 (20 ms frames)
+    frames = [0, 2, 2, 0, 1, 3, 3, 0]
+    log_probs = _emissions(frames, vocab_size=4)
+
+    rows = align_ayahs(log_probs, [(1, "ا"), (2, "ب")], vocab, blank=0)
+
+    assert [r["ayah"] for r in rows] == [1, 2]
+    assert (rows[0]["start"], rows[0]["end"]) == (0.02, 0.06)
+    # The delimiter at frame 4 is not part of ayah 2
+    assert (rows[1]["start"], rows[1]["end"]) == (0.10, 0.14)
+    assert all(r["score"] > 0.8 for r in rows)
@@ -0,0 +1,32 @@
+import os
+import sys
+sys.path.append(os.path.abspath("."))
+
+from scripts.generate_embeddings import WINDOW_STRIDE, WINDOW_WORDS, build_spans
+
+
+def _row(ayah, n_words, surah=1):
+    return {"surah": surah, "ayah": ayah, "english_text": f"({ayah}) " + " ".join(f"w{i}" for i in range(n_words))}
+
+
+def test_windows_step_by_stride_and_end_flush_with_the_ayah():
+    n_words = 2 * WINDOW_WORDS + 5
+    texts, spans = build_spans([_row(1, n_words)])
+
+    last_start = n_words - WINDOW_WORDS
+    assert [s["word_offset"] for s in spans] == list(range(0, last_start, WINDOW_STRIDE)) + [last_start]
+    assert all(s["kind"] == "window" for s in spans)
+    assert texts[-1].split()[-1] == f"w{n_words - 1}"
+    assert all(len(t.split()) == WINDOW_WORDS for t in texts)
+
+
+def test_pairs_join_adjacent_ayahs_of_the_same_surah():
+    half = WINDOW_WORDS // 2
+    rows = [_row(1, half + 4), _row(2, half + 5), _row(1, 5, surah=2)]
+    texts, spans = build_spans(rows)
+
+    # Short ayahs get no windows, and no pair crosses the surah boundary
+    assert spans == [{"surah": 1, "ayah": 1, "end_ayah": 2, "word_offset": 4, "kind": "pair"}]
+    words = texts[0].split()
+    assert words[:half] == [f"w{i}" for i in range(4, half + 4)]
+    assert words[half:] == [f"w{i}" for i in range(half)]
@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.append(os.path.abspath("."))
+
+import pytest
+
+import rate_limit
+from rate_limit import InMemoryBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_take_allows_burst_then_reports_wait(clock):
+    backend = InMemoryBackend()
+
+    # rate 0.5/s, burst 3: three immediate calls pass, the fourth waits 2s
+    assert [backend.take("u:transcribe", 0.5, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert backend.take("u:transcribe", 0.5, 3) == pytest.approx(2.0)
+
+    # Half a second later half a token has come back
+    clock[0] += 0.5
+    assert backend.take("u:transcribe", 0.5, 3) == pytest.approx(1.5)
+
+
+def test_take_refills_up_to_capacity(clock):
+    backend = InMemoryBackend()
+    for _ in range(2):
+        backend.take("u:match", 1.0, 2)
+
+    clock[0] += 60
+    assert [backend.take("u:match", 1.0, 2) for _ in range(2)] == [0.0, 0.0]
+    assert backend.take("u:match", 1.0, 2) == pytest.approx(1.0)
+
+
+def test_prune_uses_each_buckets_own_limits(clock, monkeypatch):
+    monkeypatch.setattr(InMemoryBackend, "MAX_KEYS", 1)
+    backend = InMemoryBackend()
+
+    # A slow endpoint's empty bucket must survive a prune triggered by a fast one
+    backend.take("u:transcribe", 0.01, 1)
+    clock[0] += 1
+    backend.take("u:match", 100.0, 10)
+
+    assert backend.take("u:transcribe", 0.01, 1) > 0
+
+
+def test_redis_outage_falls_back_to_in_process_limits(clock):
+    pytest.importorskip("redis")
+    backend = rate_limit.RedisBackend("redis://127.0.0.1:1/0")  # nothing listens here
+
+    assert backend.take("u:transcribe", 0.5, 1) == 0.0
+    assert backend.take("u:transcribe", 0.5, 1) == pytest.approx(2.0)
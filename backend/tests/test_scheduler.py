@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+sys.path.append(os.path.abspath("."))
+
+import pytest
+
+from ml.scheduler import FairScheduler, QueueFullError
+
+
+def test_fair_scheduler_round_robin():
+    scheduler = FairScheduler(workers=1, max_pending_per_user=0)
+    order = []
+
+    # Hold the worker so every job is queued before any is picked
+    gate = threading.Event()
+    blocker = scheduler.submit("blocker", gate.wait)
+
+    jobs = [scheduler.submit("heavy", order.append, f"heavy{i}") for i in range(3)]
+    jobs.append(scheduler.submit("light", order.append, "light0"))
+
+    gate.set()
+    blocker.result(timeout=5)
+    for job in jobs:
+        job.result(timeout=5)
+
+    # The light user's only job runs right after the heavy user's first one
+    assert order == ["heavy0", "light0", "heavy1", "heavy2"]
+
+
+def test_fair_scheduler_caps_pending_per_user():
+    scheduler = FairScheduler(workers=1, max_pending_per_user=1)
+    gate = threading.Event()
+    scheduler.submit("other", gate.wait)
+    scheduler.submit("user", lambda: None)
+
+    with pytest.raises(QueueFullError):
+        scheduler.submit("user", lambda: None)
+    gate.set()
+
+
+def test_fair_scheduler_propagates_exceptions():
+    scheduler = FairScheduler(workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        scheduler.submit("user", fail).result(timeout=5)
@@ -0,0 +1,54 @@
+import importlib
+import os
+import sys
+import types
+sys.path.append(os.path.abspath("."))
+
+import pytest
+
+
+def _match(ayah, similarity=0.8, kind="ayah", word_offset=0, end_ayah=None):
+    return {
+        "surah": 67, "ayah": ayah, "similarity": similarity, "match_kind": kind,
+        "word_offset": word_offset, "end_ayah": end_ayah or ayah,
+    }
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """A SessionManager whose matcher returns the matches queued in session.queue."""
+    queue = []
+    matcher = types.ModuleType("scripts.ayah_matcher")
+    matcher.find_most_similar_ayah = lambda transcript, top_k=3, surah_filter=None: [queue.pop(0)]
+    matcher.get_ayah = lambda surah, ayah: None
+    monkeypatch.setitem(sys.modules, "scripts.ayah_matcher", matcher)
+    monkeypatch.delitem(sys.modules, "hifz.session_manager", raising=False)
+
+    session = importlib.import_module("hifz.session_manager").SessionManager()
+    session.queue = queue
+    yield session
+    # Don't leave the stub-bound module behind for other tests
+    sys.modules.pop("hifz.session_manager", None)
+
+
+def test_later_window_of_current_ayah_is_continuing(session):
+    session.queue += [_match(5), _match(5, kind="window", word_offset=10), _match(6)]
+
+    assert session.process_transcript("...", verbose=False)["status"] == "session_start"
+
+    result = session.process_transcript("...", verbose=False)
+    assert result["status"] == "continuing"
+    assert result["ayahs"] == []
+    assert session.tracker.expected == 6
+
+    assert session.process_transcript("...", verbose=False)["ayahs"] == [(6, "correct")]
+
+
+def test_boundary_pair_credits_both_ayahs(session):
+    session.queue += [_match(5), _match(6, kind="pair", word_offset=12, end_ayah=7)]
+    session.process_transcript("...", verbose=False)
+
+    result = session.process_transcript("...", verbose=False)
+    assert result["ayahs"] == [(6, "correct"), (7, "correct")]
+    assert result["status"] == "correct"
+    assert session.ayah_history == [5, 6, 7]
@@ -0,0 +1,54 @@
+import hashlib
+
+import orjson
+from fastapi import Request, Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a weak ETag from the given values.
+
+    Weak, because the compression middleware may re-encode the body while the
+    representation stays semantically the same.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already covers `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_response(request: Request, content, etag: str = None) -> Response:
+    """
+    Serialize `content` with orjson and honour If-None-Match.
+
+    Args:
+        request: Incoming request (for If-None-Match).
+        content: Plain dicts/lists; datetimes and UUIDs are handled by orjson.
+        etag (str): Precomputed ETag; derived from the body if omitted.
+
+    Returns:
+        Response: 200 with the JSON body, or 304 if the client copy is current.
+    """
+    body = orjson.dumps(content)
+    if etag is None:
+        etag = make_etag(body)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
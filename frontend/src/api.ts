@@ -57,6 +57,24 @@ export interface MemorizationStat {
   last_attempted: string;
 }
 
+export interface SurahProgress {
+  surah: number;
+  ayahs_covered: number;
+  total_ayahs: number;
+  completion_percentage: number;
+  total_attempts: number;
+  last_attempted: string;
+}
+
+export interface MemorizationSummary {
+  total_ayahs_covered: number;
+  completion_percentage: number;
+  current_streak: number;
+  longest_streak: number;
+  surahs: SurahProgress[];
+  weakest_ayahs: MemorizationStat[];
+}
+
 // API functions
 export const transcribeAudio = async (audioBlob: Blob): Promise<TranscribeResponse> => {
   const formData = new FormData();
@@ -87,6 +105,11 @@ export const getMemorizationStats = async (surah?: number): Promise<Memorization
   return response.data;
 };
 
+export const getMemorizationSummary = async (): Promise<MemorizationSummary> => {
+  const response = await api.get('/api/memorization_summary');
+  return response.data;
+};
+
 export const healthCheck = async (): Promise<{ status: string; service: string }> => {
   const response = await api.get('/api/health');
   return response.data;